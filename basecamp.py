@@ -0,0 +1,152 @@
+"""Basecamp 3 API client with pooled connections and a concurrent todo crawler."""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_URL = "https://3.basecampapi.com"
+USER_AGENT = "ESCPrinter (daniel@dakoller.net)"
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_RETRIES = 5
+
+# Seconds a cached collection is served without revalidation
+DEFAULT_TTLS = {
+    "projects": 3600,
+    "todolists": 600,
+    "todos": 0,
+}
+
+
+def _retry_after(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a throttled request."""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+    # No usable header, fall back to exponential backoff
+    return min(2 ** attempt, 30)
+
+
+class BasecampClient:
+    """Client for one Basecamp account, safe to share between threads."""
+
+    def __init__(
+        self,
+        access_token: str,
+        account_id,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        cache: Optional[HttpCache] = None,
+        ttls: Optional[Dict[str, float]] = None,
+    ):
+        self.account_id = account_id
+        self.cache = cache
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        # One keep-alive pool, sized so every worker can hold a connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {access_token}",
+                "User-Agent": USER_AGENT,
+            }
+        )
+
+    def url(self, path: str) -> str:
+        """Build an absolute API URL for the account."""
+        return f"{BASE_URL}/{self.account_id}/{path}"
+
+    def get(self, url: str, ttl: float = 0) -> requests.Response:
+        """GET a URL, backing off while Basecamp answers 429."""
+        for attempt in range(self.max_retries + 1):
+            if self.cache:
+                response = self.cache.get(url, ttl=ttl, session=self.session, timeout=self.timeout)
+            else:
+                response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            delay = _retry_after(response, attempt)
+            _LOGGER.info(f"Basecamp rate limit hit, retrying {url} in {delay:.1f}s")
+            time.sleep(delay)
+
+        response.raise_for_status()
+        return response
+
+    def get_all(self, url: str, ttl: float = 0) -> Iterator[Dict]:
+        """Yield every item of a collection, following Link header pagination."""
+        while url:
+            response = self.get(url, ttl=ttl)
+            yield from response.json()
+            url = response.links.get("next", {}).get("url")
+
+    def projects(self) -> List[Dict]:
+        """Return all active projects."""
+        return list(self.get_all(self.url("projects.json"), ttl=self.ttls["projects"]))
+
+    def todolists(self, project: Dict) -> List[Dict]:
+        """Return the todolists of a project, or nothing if it has no todoset."""
+        todoset_id = None
+        for item in project.get("dock", []):
+            if item["name"] == "todoset":
+                todoset_id = item["id"]
+
+        if todoset_id is None:
+            return []
+
+        return list(self.get_all(self.url(f"buckets/{project['id']}/todosets/{todoset_id}/todolists.json"), ttl=self.ttls["todolists"]))
+
+    def todos(self, project_id, todolist_id) -> List[Dict]:
+        """Return the open todos of a todolist."""
+        return list(self.get_all(self.url(f"buckets/{project_id}/todolists/{todolist_id}/todos.json"), ttl=self.ttls["todos"]))
+
+    def assigned_todos(self, person_id: int, projects: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """Yield todos assigned to a person as soon as their todolist is fetched.
+
+        Todolist and todo requests fan out over at most ``max_workers``
+        concurrent connections; todo fetches start while other projects
+        are still listing their todolists.
+        """
+        if projects is None:
+            projects = self.projects()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="basecamp") as executor:
+            pending = {executor.submit(self.todolists, project): project for project in projects}
+            todo_futures = set()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    project = pending.pop(future)
+                    if future not in todo_futures:
+                        for todolist in future.result():
+                            todo_future = executor.submit(self.todos, project["id"], todolist["id"])
+                            todo_futures.add(todo_future)
+                            pending[todo_future] = project
+                        continue
+
+                    todo_futures.discard(future)
+                    for todo in future.result():
+                        if any(assignee["id"] == person_id for assignee in todo.get("assignees", [])):
+                            yield todo
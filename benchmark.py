@@ -0,0 +1,452 @@
+"""End-to-end print benchmark against the printer emulator.
+
+Runs the Flask app from run.py against a local printer emulator and stub
+servers for the RSS feeds, Basecamp, zenquotes and sunrise-sunset, and
+reports throughput, latency and bytes sent for single prints, bursts and
+the full digest. The ``ha_burst`` scenario sends a burst through the Home
+Assistant integration's PrinterManager and JobManager instead, it needs
+Home Assistant installed. Save a run with ``--json`` and compare later
+runs to it with ``--baseline``.
+
+    python benchmark.py --jobs 50 --latency 0.05 --json baseline.json
+    python benchmark.py --jobs 50 --latency 0.05 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from printer_emulator import PrinterEmulator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upstream hosts the digest talks to, all answered by the stub server
+STUB_HOSTS = (
+    "www.rnz.de",
+    "www.tagesschau.de",
+    "zenquotes.io",
+    "api.sunrise-sunset.org",
+    "launchpad.37signals.com",
+    "3.basecampapi.com",
+    "api.ticktick.com",
+)
+
+ACCOUNT_ID = 4242
+PERSON_ID = 7
+PAGE_SIZE = 15
+
+# How long a scenario's receipts may take to reach the emulator after its last job returned
+SETTLE_TIMEOUT = 10
+HA_PRINTER = "Benchmark"
+
+WORDS = (
+    "Heidelberg Gemeinderat beschließt Straßenbahn Neckarufer Bürgerinnen Öffnungszeiten "
+    "Universität Altstadt Verkehr Baustelle Hauptstraße Überführung Sanierung Kommission "
+    "Wetter Frühling Veranstaltung Konzert Ausstellung Bahnhof Brücke Förderung"
+).split()
+
+
+def _words(seed: int, count: int) -> str:
+    return " ".join(WORDS[(seed * 7 + i * 3) % len(WORDS)] for i in range(count))
+
+
+def rss_feed(items: int) -> bytes:
+    """Return an RSS document with ``items`` entries."""
+    entries = "".join(
+        f"<item><title>{_words(i, 8)}</title><link>https://www.rnz.de/{i}</link>"
+        f"<description><![CDATA[<p>{_words(i + 1, 60)}</p>]]></description></item>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Benchmark</title>{entries}</channel></rss>"
+    ).encode("utf-8")
+
+
+class StubApi:
+    """Canned upstream responses, keyed by host and path."""
+
+    def __init__(self, rss_items: int = 200, projects: int = 6, todolists: int = 4, todos: int = 40):
+        self.projects = projects
+        self.todolists = todolists
+        self.todos = todos
+        self.feed = rss_feed(rss_items)
+
+    def respond(self, host: str, path: str) -> Tuple[int, Dict[str, str], bytes]:
+        path, _, query = path.partition("?")
+        if host in ("www.rnz.de", "www.tagesschau.de"):
+            return 200, {"Content-Type": "application/rss+xml"}, self.feed
+        if host == "zenquotes.io":
+            return self._json([{"q": _words(3, 14), "a": "Benchmark"}])
+        if host == "api.sunrise-sunset.org":
+            return self._json({"results": {"sunrise": "6:12:04 AM", "sunset": "8:31:55 PM"}, "status": "OK"})
+        if host == "launchpad.37signals.com":
+            return self._json({"accounts": [{"product": "bc3", "id": ACCOUNT_ID, "name": "Benchmark"}]})
+        if host == "3.basecampapi.com":
+            return self._basecamp(path, query)
+        if host == "api.ticktick.com":
+            return self._ticktick(path)
+        return 404, {}, b""
+
+    def _ticktick(self, path: str) -> Tuple[int, Dict[str, str], bytes]:
+        parts = path.strip("/").split("/")[2:]
+        if parts == ["project"]:
+            return self._json([{"id": f"p{p}", "name": f"Liste {p}"} for p in range(1, self.projects + 1)])
+        if len(parts) == 3 and parts[2] == "data":
+            project = parts[1]
+            return self._json({"project": {"id": project}, "tasks": [
+                {
+                    "id": f"{project}t{t}",
+                    "projectId": project,
+                    "title": _words(len(project) + t, 5),
+                    "dueDate": time.strftime("%Y-%m-%dT06:00:00.000+0000", time.gmtime()) if t % 3 == 0 else None,
+                    "status": 0,
+                }
+                for t in range(self.todos // 4)
+            ]})
+        return 404, {}, b""
+
+    def _basecamp(self, path: str, query: str) -> Tuple[int, Dict[str, str], bytes]:
+        parts = path.strip("/").split("/")[1:]
+        if parts == ["projects.json"]:
+            return self._json([
+                {"id": p, "name": f"Projekt {p}", "dock": [{"name": "todoset", "id": 1000 + p}]}
+                for p in range(1, self.projects + 1)
+            ])
+        if len(parts) == 5 and parts[2] == "todosets":
+            project = int(parts[1])
+            return self._json([{"id": project * 100 + t} for t in range(self.todolists)])
+        if len(parts) == 5 and parts[2] == "todolists":
+            todolist = int(parts[3])
+            todos = [
+                {
+                    "id": todolist * 1000 + t,
+                    "content": _words(todolist + t, 6),
+                    "due_on": f"2024-0{1 + t % 9}-1{t % 10}" if t % 3 else None,
+                    "status": "active",
+                    "app_url": f"https://3.basecamp.com/{ACCOUNT_ID}/buckets/{todolist // 100}/todos/{todolist * 1000 + t}",
+                    "bucket": {"name": f"Projekt {todolist // 100}"},
+                    "assignees": [{"id": PERSON_ID if t % 4 == 0 else PERSON_ID + 1}],
+                }
+                for t in range(self.todos)
+            ]
+            page = int(query.partition("page=")[2] or 1)
+            status, headers, body = self._json(todos[(page - 1) * PAGE_SIZE:page * PAGE_SIZE])
+            if page * PAGE_SIZE < len(todos):
+                headers["Link"] = f'<https://3.basecampapi.com{path}?page={page + 1}>; rel="next"'
+            return status, headers, body
+        return 404, {}, b""
+
+    @staticmethod
+    def _json(data) -> Tuple[int, Dict[str, str], bytes]:
+        return 200, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8")
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The feed reader hangs up once it has the entries it prints
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Serves a ``StubApi`` over HTTP, optionally with a delay per request.
+
+    The original host travels as the first path segment, see
+    ``redirect_upstream``. Responses carry an ETag, so conditional GETs
+    from the HTTP cache are answered with 304 like the real APIs do.
+    """
+
+    def __init__(self, api: StubApi, latency: float = 0.0):
+        self.api = api
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                host, _, path = self.path.lstrip("/").partition("/")
+                status, headers, body = stub.api.respond(host, "/" + path)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("ETag", etag)
+                self.send_header("Date", formatdate(usegmt=True))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _QuietServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-api", daemon=True)
+
+    def start(self) -> int:
+        self._thread.start()
+        return self.port
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def redirect_upstream(port: int) -> None:
+    """Send every request for a stubbed host to the stub server instead.
+
+    Patched on the transport adapter, so the sessions that run.py, the
+    HTTP cache and the Basecamp client build for themselves are covered.
+    """
+    send = requests.adapters.HTTPAdapter.send
+
+    def redirected(adapter, request, *args, **kwargs):
+        url = urlsplit(request.url)
+        if url.hostname in STUB_HOSTS:
+            request.url = f"http://127.0.0.1:{port}/{url.hostname}{url.path or '/'}" + (f"?{url.query}" if url.query else "")
+        return send(adapter, request, *args, **kwargs)
+
+    requests.adapters.HTTPAdapter.send = redirected
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Benchmark:
+    """Drives run.py's HTTP routes and measures what reaches the printer."""
+
+    def __init__(self, app_module, emulator: PrinterEmulator, workdir: str):
+        self.run = app_module
+        self.emulator = emulator
+        self.workdir = workdir
+        self.client = app_module.app.test_client()
+
+    def measure(self, name: str, jobs: int, scenario: Callable[[int], List[float]]) -> Dict:
+        before = self.emulator.stats()
+        started = time.perf_counter()
+        latencies = scenario(jobs)
+        # A job can be reported done before the emulator has parsed all of its bytes
+        if not self.emulator.wait_for(before["receipts"] + jobs, SETTLE_TIMEOUT):
+            _LOGGER.warning(f"{name}: gave up waiting for receipts after {SETTLE_TIMEOUT}s")
+        elapsed = time.perf_counter() - started
+        after = self.emulator.stats()
+        printed = after["printed"] - before["printed"]
+        result = {
+            "scenario": name,
+            "jobs": jobs,
+            "printed": printed,
+            "seconds": elapsed,
+            "jobs_per_sec": printed / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "bytes": after["bytes"] - before["bytes"],
+            "bytes_per_job": (after["bytes"] - before["bytes"]) / printed if printed else 0,
+        }
+        if printed != jobs:
+            _LOGGER.warning(f"{name}: {jobs - printed} of {jobs} jobs did not reach the printer")
+        return result
+
+    def _print_text(self, i: int) -> float:
+        started = time.perf_counter()
+        response = self.client.get("/print_text", query_string={"headline": f"Beleg {i}", "text": _words(i, 40)})
+        job = self.run.print_queue.get(response.get_json()["job_id"])
+        job.wait(self.run.print_wait_timeout)
+        return time.perf_counter() - started
+
+    def single(self, jobs: int) -> List[float]:
+        """One print at a time, each waiting for the previous one."""
+        return [self._print_text(i) for i in range(jobs)]
+
+    def burst(self, jobs: int, concurrency: int = 8) -> List[float]:
+        """All prints submitted at once from several clients."""
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(self._print_text, range(jobs)))
+
+    def _print_news(self, refresh: bool) -> float:
+        started = time.perf_counter()
+        response = self.client.get("/print_news", query_string={"refresh": "1"} if refresh else {})
+        if response.status_code != 200:
+            _LOGGER.warning(f"/print_news answered {response.status_code}: {response.get_json()}")
+        return time.perf_counter() - started
+
+    def digest(self, jobs: int) -> List[float]:
+        """The full digest, fetched and rendered for every print."""
+        return [self._print_news(True) for _ in range(jobs)]
+
+    def digest_warm(self, jobs: int) -> List[float]:
+        """The pre-rendered digest, only sent for every print."""
+        self.run.current_digest()
+        return [self._print_news(False) for _ in range(jobs)]
+
+    def ha_burst(self, jobs: int) -> List[float]:
+        """All prints submitted at once to the Home Assistant integration's job queue."""
+        return asyncio.run(self._async_ha_burst(jobs))
+
+    async def _async_ha_burst(self, jobs: int) -> List[float]:
+        from homeassistant.core import HomeAssistant
+
+        from custom_components.escpos_printer import PrinterManager
+        from custom_components.escpos_printer.jobs import EVENT_JOB_FINISHED, JobManager
+
+        hass = HomeAssistant(self.workdir)
+        manager = PrinterManager(hass)
+        manager.load_printers_from_config(
+            [{"name": HA_PRINTER, "host": self.emulator.host, "port": self.emulator.port}]
+        )
+        job_manager = JobManager(
+            hass,
+            manager.print_raw,
+            backup_for=manager.backup_for,
+            is_down=manager.is_down,
+            retry_in=manager.retry_in,
+            metrics=manager.metrics,
+        )
+        finished: Dict[str, asyncio.Future] = {}
+
+        def job_finished(event) -> None:
+            future = finished.get(event.data["job_id"])
+            if future is not None and not future.done():
+                future.set_result(event.data["status"])
+
+        unsubscribe = hass.bus.async_listen(EVENT_JOB_FINISHED, job_finished)
+
+        async def print_text(i: int) -> float:
+            started = time.perf_counter()
+            data = manager.render_text(_words(i, 40), f"Beleg {i}")
+            job_id = f"benchmark-{i}"
+            finished[job_id] = hass.loop.create_future()
+            await job_manager.async_submit(HA_PRINTER, data, job_id=job_id)
+            await finished[job_id]
+            return time.perf_counter() - started
+
+        try:
+            return list(await asyncio.gather(*(print_text(i) for i in range(jobs))))
+        finally:
+            unsubscribe()
+            await job_manager.async_stop()
+            await hass.async_add_executor_job(manager.pool.close_all)
+
+
+def report(results: List[Dict], baseline: Optional[Dict[str, Dict]] = None) -> None:
+    header = f"{'scenario':<12} {'jobs':>5} {'jobs/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'bytes/job':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['scenario']:<12} {result['printed']:>5} {result['jobs_per_sec']:>9.2f}"
+            f" {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['bytes_per_job']:>10.0f}"
+        )
+        base = (baseline or {}).get(result["scenario"])
+        if base:
+            deltas = []
+            for key in ("jobs_per_sec", "p50_ms", "p99_ms", "bytes_per_job"):
+                if base[key]:
+                    deltas.append(f"{key} {(result[key] - base[key]) / base[key] * 100:+.1f}%")
+            print(f"{'':<12} vs baseline: {', '.join(deltas)}")
+
+
+SCENARIOS = ("single", "burst", "digest", "digest_warm")
+# Only run when asked for, they need Home Assistant
+EXTRA_SCENARIOS = ("ha_burst",)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20, help="Prints per scenario")
+    parser.add_argument("--digest-jobs", type=int, default=5, help="Prints for the digest scenarios")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients submitting at once in the burst")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS + EXTRA_SCENARIOS, help="Run only these scenarios")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every upstream request takes")
+    parser.add_argument("--bandwidth", type=float, help="Bytes per second the emulated printer reads")
+    parser.add_argument("--rss-items", type=int, default=200, help="Entries in the stub feeds")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Compare against results written earlier with --json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    emulator = PrinterEmulator(port=0, bandwidth=args.bandwidth)
+    printer_host, printer_port = emulator.start()
+    stub = StubServer(StubApi(rss_items=args.rss_items), latency=args.latency)
+    redirect_upstream(stub.start())
+
+    # run.py reads its settings at import, point it at the emulator and throwaway state
+    workdir = tempfile.mkdtemp(prefix="escpos-benchmark-")
+    os.environ.update({
+        "PRINTER_IP": printer_host,
+        "PRINTER_PORT": str(printer_port),
+        "PRINT_SPOOL_PATH": os.path.join(workdir, "spool.sqlite"),
+        "HTTP_CACHE_PATH": os.path.join(workdir, "http_cache.sqlite"),
+        "RASTER_CACHE_DIR": os.path.join(workdir, "raster"),
+        "BASECAMP_OWN_ACCOUNT_ID": str(PERSON_ID),
+        "DIGEST_SCHEDULE": "0 0 1 1 *",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    for token_file in (".bc_token", ".tt_token"):
+        with open(token_file, "w") as f:
+            f.write("benchmark")
+
+    import run
+
+    benchmark = Benchmark(run, emulator, workdir)
+    scenarios = {
+        "single": (args.jobs, benchmark.single),
+        "burst": (args.jobs, lambda jobs: benchmark.burst(jobs, args.concurrency)),
+        "digest": (args.digest_jobs, benchmark.digest),
+        "digest_warm": (args.digest_jobs, benchmark.digest_warm),
+        "ha_burst": (args.jobs, benchmark.ha_burst),
+    }
+    results = []
+    for name in args.scenario or SCENARIOS:
+        jobs, scenario = scenarios[name]
+        results.append(benchmark.measure(name, jobs, scenario))
+
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+    report(results, baseline)
+    print(f"\n{stub.requests} upstream requests, {emulator.stats()['connections']} printer connections")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"created": time.time(), "args": vars(args), "results": results}, f, indent=2)
+
+    stub.stop()
+    emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
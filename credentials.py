@@ -0,0 +1,214 @@
+"""Cached OAuth tokens and the Basecamp account they belong to."""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from basecamp import DEFAULT_TIMEOUT, USER_AGENT
+
+_LOGGER = logging.getLogger(__name__)
+
+LAUNCHPAD_URL = "https://launchpad.37signals.com"
+DEFAULT_ACCOUNT_TTL = 24 * 3600
+# Basecamp tokens last two weeks, renew them with a few days to spare
+DEFAULT_REFRESH_MARGIN = 3 * 24 * 3600
+
+
+class TokenFile:
+    """An OAuth token stored in a file, parsed again only when the file changes.
+
+    The file holds either the bare access token, as older versions wrote
+    it, or a JSON object with ``access_token`` and optionally
+    ``refresh_token`` and ``expires_at`` (Unix time). Every read is a
+    ``stat``; the file is only opened when its modification time or size
+    differs from the last read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stat: Optional[Tuple[int, int]] = None
+        self._token: Dict = {}
+        self._lock = threading.Lock()
+
+    def read(self) -> Dict:
+        """Return the token, empty if the file is missing or empty."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key != self._stat:
+                with open(self.path, "r") as f:
+                    content = f.read().strip()
+                try:
+                    token = json.loads(content) if content.startswith("{") else {"access_token": content}
+                except ValueError:
+                    _LOGGER.error(f"Could not parse token file {self.path}")
+                    token = {}
+                self._token = {key: value for key, value in token.items() if value}
+                self._stat = key
+            return self._token
+
+    def write(self, token: Dict) -> None:
+        """Replace the token, atomically for concurrent readers."""
+        if token.get("expires_in") and not token.get("expires_at"):
+            token = dict(token, expires_at=time.time() + float(token["expires_in"]))
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(token, f)
+        os.replace(tmp, self.path)
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """Return the current access token."""
+        return self.read().get("access_token")
+
+
+class BasecampCredentials:
+    """The Basecamp access token and bc3 account id, resolved off the print path.
+
+    The account id is looked up once per token with launchpad's
+    authorization.json and kept for ``account_ttl`` seconds; a token file
+    that changes on disk, e.g. after a new OAuth login, is looked up again.
+    Once the account id has expired, ``get`` keeps returning it while a
+    background thread looks it up again, so a print only ever waits for
+    launchpad when nothing is known yet.
+
+    ``maintain`` is meant to run on a schedule: it renews the token with
+    its refresh token when it is within ``refresh_margin`` of expiring,
+    and looks the account up again when it is stale.
+    """
+
+    def __init__(
+        self,
+        tokens: TokenFile,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        redirect_uri: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        account_ttl: float = DEFAULT_ACCOUNT_TTL,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        self.tokens = tokens
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.timeout = timeout
+        self.account_ttl = account_ttl
+        self.refresh_margin = refresh_margin
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._account_id = None
+        self._account_token: Optional[str] = None
+        self._account_expires = 0.0
+        self._token_expires: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> Tuple[Optional[str], Optional[int]]:
+        """Return the access token and account id."""
+        access_token = self.tokens.access_token
+        if not access_token:
+            _LOGGER.error(f"No Basecamp access token in {self.tokens.path}")
+            return None, None
+
+        if access_token != self._account_token:
+            # Nothing known for this token yet, this one call has to wait
+            self._resolve(access_token)
+        elif time.time() > self._account_expires:
+            self._resolve_in_background()
+        return access_token, self._account_id
+
+    def maintain(self) -> None:
+        """Renew the token if it expires soon and refresh a stale account id."""
+        token = self.tokens.read()
+        expires_at = token.get("expires_at") or self._token_expires
+        if expires_at and expires_at - time.time() < self.refresh_margin:
+            self.refresh()
+            token = self.tokens.read()
+
+        access_token = token.get("access_token")
+        if access_token and (access_token != self._account_token or time.time() > self._account_expires):
+            self._resolve(access_token)
+
+    def refresh(self) -> bool:
+        """Exchange the refresh token for a new access token."""
+        token = self.tokens.read()
+        if not token.get("refresh_token") or not self.client_id:
+            _LOGGER.warning("Basecamp token expires soon and can't be refreshed, log in again")
+            return False
+
+        response = self.session.post(
+            f"{LAUNCHPAD_URL}/authorization/token",
+            params={
+                "type": "refresh",
+                "refresh_token": token["refresh_token"],
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "redirect_uri": self.redirect_uri,
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        renewed = response.json()
+        if "access_token" not in renewed:
+            _LOGGER.error(f"Basecamp token refresh failed: {renewed}")
+            return False
+
+        # A renewed token belongs to the same identity, the account id stays valid
+        with self._lock:
+            if self._account_token == token["access_token"]:
+                self._account_token = renewed["access_token"]
+            self._token_expires = None
+        self.tokens.write({**token, "expires_at": None, **renewed})
+        _LOGGER.info("Renewed the Basecamp access token")
+        return True
+
+    def _resolve(self, access_token: str) -> None:
+        with self._lock:
+            if access_token == self._account_token and time.time() <= self._account_expires:
+                return
+            response = self.session.get(
+                f"{LAUNCHPAD_URL}/authorization.json",
+                headers={"Authorization": f"Bearer {access_token}"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            authorization = response.json()
+
+            account_id = None
+            for item in authorization.get("accounts", []):
+                if item["product"] == "bc3":
+                    account_id = item["id"]
+            if account_id is None:
+                _LOGGER.error("No Basecamp 3 account for this token")
+
+            if authorization.get("expires_at"):
+                self._token_expires = datetime.fromisoformat(authorization["expires_at"].replace("Z", "+00:00")).timestamp()
+            self._account_id = account_id
+            self._account_token = access_token
+            self._account_expires = time.time() + self.account_ttl
+
+    def _resolve_in_background(self) -> None:
+        # Not under the lock, a lookup in flight holds it and the caller is printing
+        if self._refreshing:
+            return
+        self._refreshing = True
+
+        def run() -> None:
+            try:
+                access_token = self.tokens.access_token
+                if access_token:
+                    self._resolve(access_token)
+            except Exception as e:
+                _LOGGER.warning(f"Could not refresh the Basecamp account: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="basecamp-credentials", daemon=True).start()
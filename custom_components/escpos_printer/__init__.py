@@ -1,39 +1,95 @@
 """ESC/POS Printer integration for Home Assistant."""
 import asyncio
+import ipaddress
 import logging
-import socket
-import threading
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 import voluptuous as vol
-from escpos.printer import Network
+from escpos.printer import Dummy, Network
 
 from homeassistant import config_entries
-from homeassistant.const import CONF_HOST, CONF_NAME, CONF_PORT
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.const import CONF_HOST, CONF_NAME, CONF_PORT, CONF_SCAN_INTERVAL, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.typing import ConfigType
 
+from .breaker import DEFAULT_RESET_TIMEOUT, STATE_OPEN, CircuitBreaker, CircuitOpenError
+from .connection import DEFAULT_IDLE_TIMEOUT, ConnectionPool
+from .coordinator import DEFAULT_SCAN_INTERVAL, PrinterStatusCoordinator
+from .discovery import DEFAULT_CONCURRENCY, DiscoveryIndex, local_network
+from .groups import STRATEGIES, STRATEGY_ROUND_ROBIN, GroupRouter
+from .jobs import (
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_MAX_QUEUE_DEPTH,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_DELAY,
+    OVERFLOW_POLICIES,
+    OVERFLOW_REJECT,
+    JobManager,
+)
+from .metrics import Metrics
+from .spool import SPOOL_FILENAME, Spool
+from .status import DEFAULT_STATUS_TTL, StatusCache, offline_status, query_status
+
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "escpos_printer"
 CONF_DISCOVERY_ENABLED = "discovery_enabled"
 CONF_DISCOVERY_TIMEOUT = "discovery_timeout"
+CONF_DISCOVERY_NETWORKS = "discovery_networks"
+CONF_DISCOVERY_CONCURRENCY = "discovery_concurrency"
 CONF_PRINTERS = "printers"
+CONF_GROUPS = "groups"
+CONF_MEMBERS = "members"
+CONF_STRATEGY = "strategy"
+CONF_DEFAULT_PRINTER = "default_printer"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+CONF_QUEUE_MAX_DEPTH = "queue_max_depth"
+CONF_QUEUE_OVERFLOW = "queue_overflow"
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_STATUS_TTL = "status_ttl"
+CONF_BACKUP = "backup"
+CONF_RETRY_ATTEMPTS = "retry_attempts"
+CONF_RETRY_DELAY = "retry_delay"
+CONF_CIRCUIT_RESET = "circuit_reset"
 
 DEFAULT_PORT = 9100
 DEFAULT_DISCOVERY_TIMEOUT = 5
 
+SIGNAL_PRINTER_ADDED = f"{DOMAIN}_printer_added"
+SIGNAL_PRINTER_REMOVED = f"{DOMAIN}_printer_removed"
+
+
+def _cidr(value: str) -> str:
+    """Validate a network in CIDR notation."""
+    try:
+        return str(ipaddress.ip_network(value, strict=False))
+    except ValueError as e:
+        raise vol.Invalid(f"Invalid network {value}: {e}") from e
+
+
 # Printer configuration schema
 PRINTER_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_NAME): cv.string,
         vol.Required(CONF_HOST): cv.string,
         vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
+        vol.Optional(CONF_BACKUP): cv.string,
+    }
+)
+
+GROUP_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NAME): cv.string,
+        vol.Required(CONF_MEMBERS): vol.All(cv.ensure_list, [cv.string], vol.Length(min=1)),
+        vol.Optional(CONF_STRATEGY, default=STRATEGY_ROUND_ROBIN): vol.In(STRATEGIES),
     }
 )
 
@@ -43,9 +99,30 @@ CONFIG_SCHEMA = vol.Schema(
             {
                 vol.Optional(CONF_DISCOVERY_ENABLED, default=True): cv.boolean,
                 vol.Optional(CONF_DISCOVERY_TIMEOUT, default=DEFAULT_DISCOVERY_TIMEOUT): cv.positive_int,
+                vol.Optional(CONF_DISCOVERY_NETWORKS, default=[]): vol.All(
+                    cv.ensure_list, [vol.All(cv.string, _cidr)]
+                ),
+                vol.Optional(CONF_DISCOVERY_CONCURRENCY, default=DEFAULT_CONCURRENCY): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=1024)
+                ),
+                vol.Optional(CONF_IDLE_TIMEOUT, default=DEFAULT_IDLE_TIMEOUT): cv.positive_int,
+                vol.Optional(CONF_QUEUE_MAX_DEPTH, default=DEFAULT_MAX_QUEUE_DEPTH): cv.positive_int,
+                vol.Optional(CONF_QUEUE_OVERFLOW, default=OVERFLOW_REJECT): vol.In(OVERFLOW_POLICIES),
+                vol.Optional(CONF_COALESCE_WINDOW, default=DEFAULT_COALESCE_WINDOW): vol.All(
+                    vol.Coerce(float), vol.Range(min=0, max=5)
+                ),
+                vol.Optional(CONF_STATUS_TTL, default=DEFAULT_STATUS_TTL): cv.positive_int,
+                vol.Optional(CONF_RETRY_ATTEMPTS, default=DEFAULT_RETRY_ATTEMPTS): cv.positive_int,
+                vol.Optional(CONF_RETRY_DELAY, default=DEFAULT_RETRY_DELAY): cv.positive_int,
+                vol.Optional(CONF_CIRCUIT_RESET, default=DEFAULT_RESET_TIMEOUT): cv.positive_int,
+                vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): cv.positive_int,
                 vol.Optional(CONF_PRINTERS, default=[]): vol.All(
                     cv.ensure_list, [PRINTER_SCHEMA]
                 ),
+                vol.Optional(CONF_GROUPS, default=[]): vol.All(
+                    cv.ensure_list, [GROUP_SCHEMA]
+                ),
+                vol.Optional(CONF_DEFAULT_PRINTER): cv.string,
             }
         )
     },
@@ -54,15 +131,18 @@ CONFIG_SCHEMA = vol.Schema(
 
 SERVICE_PRINT_TEXT = "print_text"
 SERVICE_PRINT_SIMPLE = "print_simple"
+SERVICE_PRINT_BATCH = "print_batch"
 SERVICE_DISCOVER_PRINTERS = "discover_printers"
 SERVICE_ADD_PRINTER = "add_printer"
 SERVICE_REMOVE_PRINTER = "remove_printer"
+SERVICE_GET_JOB = "get_job"
 
 PRINT_TEXT_SCHEMA = vol.Schema(
     {
         vol.Required("printer"): cv.string,
         vol.Required("text"): cv.string,
         vol.Optional("headline"): cv.string,
+        vol.Optional("job_id"): cv.string,
     }
 )
 
@@ -70,6 +150,26 @@ PRINT_SIMPLE_SCHEMA = vol.Schema(
     {
         vol.Required("text"): cv.string,
         vol.Optional("printer"): cv.string,
+        vol.Optional("job_id"): cv.string,
+    }
+)
+
+PRINT_BATCH_SCHEMA = vol.Schema(
+    {
+        vol.Required("printer"): cv.string,
+        vol.Required("jobs"): vol.All(
+            cv.ensure_list,
+            [
+                vol.Schema(
+                    {
+                        vol.Required("text"): cv.string,
+                        vol.Optional("headline"): cv.string,
+                    }
+                )
+            ],
+        ),
+        vol.Optional("cut_between", default=False): cv.boolean,
+        vol.Optional("job_id"): cv.string,
     }
 )
 
@@ -89,14 +189,31 @@ REMOVE_PRINTER_SCHEMA = vol.Schema(
     }
 )
 
+GET_JOB_SCHEMA = vol.Schema(
+    {
+        vol.Required("job_id"): cv.string,
+    }
+)
+
 
 class PrinterManager:
     """Manages ESC/POS printers and their connections."""
 
-    def __init__(self, hass: HomeAssistant):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        idle_timeout: int = DEFAULT_IDLE_TIMEOUT,
+        status_ttl: int = DEFAULT_STATUS_TTL,
+        circuit_reset: int = DEFAULT_RESET_TIMEOUT,
+    ):
         self.hass = hass
         self.printers: Dict[str, Dict] = {}
-        self.discovered_printers: List[Dict] = []
+        self.circuit_reset = circuit_reset
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.metrics = Metrics()
+        self.discovery_index = DiscoveryIndex(hass)
+        self.pool = ConnectionPool(idle_timeout=idle_timeout)
+        self.status_cache = StatusCache(self._query_status, ttl=status_ttl)
 
     def load_printers_from_config(self, printers_config: List[Dict]) -> None:
         """Load printers from configuration."""
@@ -109,181 +226,187 @@ class PrinterManager:
                 "host": host,
                 "port": port,
                 "name": name,
+                "backup": printer_config.get(CONF_BACKUP),
             }
             _LOGGER.info(f"Loaded printer from config: {name} at {host}:{port}")
 
-    def add_printer(self, name: str, host: str, port: int = DEFAULT_PORT) -> bool:
-        """Add a new printer."""
+    async def async_add_printer(self, name: str, host: str, port: int = DEFAULT_PORT) -> bool:
+        """Add a new printer, or move an existing one to a new address."""
         try:
-            # Test connection
-            printer = Network(host, port=port)
-            printer.text("")  # Test connection
-            printer.close()
-
-            self.printers[name] = {
-                "host": host,
-                "port": port,
-                "name": name,
-            }
-            _LOGGER.info(f"Added printer: {name} at {host}:{port}")
-            return True
+            # Test connection, the socket stays pooled for the first job
+            await self.hass.async_add_executor_job(
+                self.pool.run, host, port, lambda printer: query_status(printer.device)
+            )
         except Exception as e:
             _LOGGER.error(f"Failed to add printer {name}: {e}")
             return False
 
-    def remove_printer(self, name: str) -> bool:
+        # Changed on the event loop only, the coordinator iterates it there
+        old = self.printers.get(name)
+        self.printers[name] = {
+            "host": host,
+            "port": port,
+            "name": name,
+            "backup": old.get("backup") if old else None,
+        }
+        if old and (old["host"], old["port"]) != (host, port):
+            # The old address's breaker state and status say nothing about the new one
+            self.breakers.pop(name, None)
+            await self._async_forget(old)
+        _LOGGER.info(f"Added printer: {name} at {host}:{port}")
+        return True
+
+    async def async_remove_printer(self, name: str) -> bool:
         """Remove a printer."""
-        if name in self.printers:
-            del self.printers[name]
-            _LOGGER.info(f"Removed printer: {name}")
-            return True
-        return False
+        if name not in self.printers:
+            return False
+        printer_config = self.printers.pop(name)
+        self.breakers.pop(name, None)
+        await self._async_forget(printer_config)
+        _LOGGER.info(f"Removed printer: {name}")
+        return True
 
-    def print_text(self, printer_name: str, text: str, headline: str = None) -> bool:
-        """Print text to a specific printer."""
+    async def _async_forget(self, printer_config: Dict) -> None:
+        """Close the connection and drop the cached status of an address no printer uses any more."""
+        address = (printer_config["host"], printer_config["port"])
+        if any((other["host"], other["port"]) == address for other in self.printers.values()):
+            return
+        self.status_cache.invalidate(*address)
+        await self.hass.async_add_executor_job(self.pool.close, *address)
+
+    @staticmethod
+    def render_text(text: str, headline: str = None, cut: bool = True) -> bytes:
+        """Compile text and an optional headline to ESC/POS bytes."""
+        printer = Dummy()
+
+        # Print headline if provided
+        if headline:
+            printer.set(double_width=True, double_height=True, align="center", bold=True)
+            printer.text(f"{headline}\n\n")
+            printer.set(double_width=False, double_height=False, align="left", bold=False)
+
+        # Print main text
+        printer.text(f"{text}\n\n")
+
+        # Cut paper
+        if cut:
+            printer.cut()
+        return printer.output
+
+    def render_batch(self, jobs: List[Dict], cut_between: bool = False) -> bytes:
+        """Compile several text jobs into one byte stream with a final cut."""
+        parts = []
+        for index, job in enumerate(jobs):
+            last = index == len(jobs) - 1
+            parts.append(self.render_text(job["text"], job.get("headline"), cut=cut_between or last))
+        return b"".join(parts)
+
+    def print_raw(self, printer_name: str, data: bytes) -> bool:
+        """Send compiled ESC/POS bytes to a printer in a single write."""
         if printer_name not in self.printers:
             _LOGGER.error(f"Printer '{printer_name}' not found")
             return False
 
-        try:
-            printer_config = self.printers[printer_name]
-            printer = Network(printer_config["host"], port=printer_config["port"])
+        printer_config = self.printers[printer_name]
+        started = time.perf_counter()
 
-            # Print headline if provided
-            if headline:
-                printer.set(double_width=True, double_height=True, align="center", bold=True)
-                printer.text(f"{headline}\n\n")
-                printer.set(double_width=False, double_height=False, align="left", bold=False)
+        def send(printer: Network) -> None:
+            # Connect covers getting a usable connection from the pool, waiting for it included
+            self.metrics.observe("stage_seconds", time.perf_counter() - started, stage="connect", printer=printer_name)
+            with self.metrics.timer("stage_seconds", stage="send", printer=printer_name):
+                printer._raw(data)
 
-            # Print main text
-            printer.text(f"{text}\n\n")
-
-            # Cut paper
-            printer.cut()
-            printer.close()
+        try:
+            # Fails straight away while the printer is known to be down
+            self.breaker(printer_name).call(self.pool.run, printer_config["host"], printer_config["port"], send)
 
+            self.metrics.inc("bytes_total", len(data), printer=printer_name)
             _LOGGER.info(f"Successfully printed to {printer_name}")
             return True
+        except CircuitOpenError as e:
+            _LOGGER.debug(str(e))
+            return False
         except Exception as e:
+            self.metrics.inc("failures_total", printer=printer_name)
             _LOGGER.error(f"Failed to print to {printer_name}: {e}")
             return False
 
-    def get_printer_status(self, printer_name: str) -> Dict:
-        """Get status of a specific printer."""
-        if printer_name not in self.printers:
-            return {"status": "not_found"}
+    def breaker(self, printer_name: str) -> CircuitBreaker:
+        """Return the circuit breaker of a printer."""
+        if printer_name not in self.breakers:
+            self.breakers[printer_name] = CircuitBreaker(f"Printer {printer_name}", reset_timeout=self.circuit_reset)
+        return self.breakers[printer_name]
 
-        try:
-            printer_config = self.printers[printer_name]
-            printer = Network(printer_config["host"], port=printer_config["port"])
-            printer.text("")  # Test connection
-            printer.close()
-            return {"status": "online", "printer": printer_config}
-        except Exception as e:
-            return {"status": "offline", "error": str(e), "printer": printer_config}
+    def is_down(self, printer_name: str) -> bool:
+        """Return whether a printer's circuit is open."""
+        breaker = self.breakers.get(printer_name)
+        return breaker is not None and breaker.state == STATE_OPEN
 
-    def discover_printers(self, timeout: int = DEFAULT_DISCOVERY_TIMEOUT) -> List[Dict]:
-        """Discover ESC/POS printers on the network."""
-        _LOGGER.info("Starting printer discovery...")
-        discovered = []
+    def retry_in(self, printer_name: str) -> float:
+        """Return the seconds until a printer's open circuit lets a call through again."""
+        breaker = self.breakers.get(printer_name)
+        return breaker.retry_in if breaker is not None else 0.0
 
-        try:
-            # Get local IP to determine network range
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-
-            # Extract network prefix (assuming /24)
-            network_prefix = ".".join(local_ip.split(".")[:-1])
-            _LOGGER.info(f"Scanning network: {network_prefix}.0/24")
-
-            # Common ESC/POS printer ports
-            ports = [9100, 9101, 9102]
-
-            def scan_host(ip):
-                for port in ports:
-                    try:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(1)
-                        result = sock.connect_ex((ip, port))
-                        sock.close()
-
-                        if result == 0:
-                            # Try to connect with python-escpos to verify it's a printer
-                            try:
-                                printer = Network(ip, port=port)
-                                printer.text("")  # Test connection
-                                printer.close()
-
-                                discovered.append(
-                                    {
-                                        "host": ip,
-                                        "port": port,
-                                        "name": f"Printer at {ip}:{port}",
-                                        "status": "discovered",
-                                    }
-                                )
-                                _LOGGER.info(f"Discovered printer at {ip}:{port}")
-                                break
-                            except Exception as e:
-                                _LOGGER.debug(f"Port {port} open at {ip} but not a printer: {e}")
-                    except Exception as e:
-                        _LOGGER.debug(f"Error scanning {ip}:{port}: {e}")
-
-            # Scan network in parallel
-            threads = []
-            for i in range(1, 255):
-                ip = f"{network_prefix}.{i}"
-                thread = threading.Thread(target=scan_host, args=(ip,))
-                thread.start()
-                threads.append(thread)
-
-                # Limit concurrent threads
-                if len(threads) >= 50:
-                    for t in threads:
-                        t.join()
-                    threads = []
-
-            # Wait for remaining threads
-            for t in threads:
-                t.join()
+    def backup_for(self, printer_name: str) -> Optional[str]:
+        """Return the configured backup of a printer, if it exists."""
+        backup = self.printers.get(printer_name, {}).get("backup")
+        return backup if backup in self.printers else None
 
-        except Exception as e:
-            _LOGGER.error(f"Error during discovery: {e}")
-
-        self.discovered_printers = discovered
-        _LOGGER.info(f"Discovery complete. Found {len(discovered)} printers")
-        return discovered
+    def print_text(self, printer_name: str, text: str, headline: str = None) -> bool:
+        """Print text to a specific printer."""
+        return self.print_raw(printer_name, self.render_text(text, headline))
 
+    def _query_status(self, host: str, port: int) -> Dict:
+        try:
+            return self.pool.probe(host, port, query_status)
+        except Exception as e:
+            return offline_status(str(e))
 
-class PrinterEntity(Entity):
-    """Representation of a printer entity."""
+    def get_printer_status(self, printer_name: str, max_age: Optional[float] = None) -> Dict:
+        """Get status of a specific printer, cached for a few seconds."""
+        if printer_name not in self.printers:
+            return {"status": "not_found"}
 
-    def __init__(self, printer_manager: PrinterManager, printer_name: str):
-        self._printer_manager = printer_manager
-        self._printer_name = printer_name
-        self._state = "unknown"
+        printer_config = self.printers[printer_name]
+        status = self.status_cache.get(printer_config["host"], printer_config["port"], max_age)
+        if status.get("online") and self.is_down(printer_name):
+            # Answering status queries again, so jobs don't have to wait out the circuit
+            self.breaker(printer_name).record_success()
+        return {**status, "printer": printer_config}
 
     @property
-    def name(self):
-        """Return the name of the printer."""
-        return f"Printer {self._printer_name}"
+    def discovered_printers(self) -> List[Dict]:
+        """Return the printers the discovery index currently sees online."""
+        return self.discovery_index.printers()
+
+    async def async_discover_printers(
+        self,
+        networks: Optional[List[str]] = None,
+        timeout: int = DEFAULT_DISCOVERY_TIMEOUT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[Dict]:
+        """Discover ESC/POS printers on the network.
+
+        Previously found printers are probed first and returned right away;
+        the rest of the range is swept in the background.
+        """
+        _LOGGER.info("Starting printer discovery...")
 
-    @property
-    def state(self):
-        """Return the state of the printer."""
-        return self._state
+        try:
+            await self.discovery_index.async_load()
+            await self.discovery_index.async_refresh_known()
 
-    @property
-    def should_poll(self):
-        """No polling needed."""
-        return False
+            if not networks:
+                networks = [await self.hass.async_add_executor_job(local_network)]
+            _LOGGER.info(f"Sweeping networks in the background: {', '.join(networks)}")
+            self.discovery_index.async_start_sweep(networks, timeout, concurrency)
+
+        except Exception as e:
+            _LOGGER.error(f"Error during discovery: {e}")
 
-    def update(self):
-        """Update the printer status."""
-        status = self._printer_manager.get_printer_status(self._printer_name)
-        self._state = status["status"]
+        discovered = self.discovered_printers
+        _LOGGER.info(f"Found {len(discovered)} known printers online")
+        return discovered
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
@@ -292,20 +415,72 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         return True
 
     config_data = config[DOMAIN]
-    printer_manager = PrinterManager(hass)
+    printer_manager = PrinterManager(
+        hass,
+        idle_timeout=config_data.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+        status_ttl=config_data.get(CONF_STATUS_TTL, DEFAULT_STATUS_TTL),
+        circuit_reset=config_data.get(CONF_CIRCUIT_RESET, DEFAULT_RESET_TIMEOUT),
+    )
 
     # Load printers from configuration
     printers_config = config_data.get(CONF_PRINTERS, [])
     printer_manager.load_printers_from_config(printers_config)
 
+    # Jobs are spooled to disk before they're sent, so a restart doesn't lose them
+    spool = await hass.async_add_executor_job(Spool, hass.config.path(SPOOL_FILENAME))
+    job_manager = JobManager(
+        hass,
+        printer_manager.print_raw,
+        max_depth=config_data.get(CONF_QUEUE_MAX_DEPTH, DEFAULT_MAX_QUEUE_DEPTH),
+        overflow=config_data.get(CONF_QUEUE_OVERFLOW, OVERFLOW_REJECT),
+        coalesce_window=config_data.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW),
+        spool=spool,
+        retry_attempts=config_data.get(CONF_RETRY_ATTEMPTS, DEFAULT_RETRY_ATTEMPTS),
+        retry_delay=config_data.get(CONF_RETRY_DELAY, DEFAULT_RETRY_DELAY),
+        backup_for=printer_manager.backup_for,
+        is_down=printer_manager.is_down,
+        retry_in=printer_manager.retry_in,
+        metrics=printer_manager.metrics,
+    )
+    await job_manager.async_start()
+
+    coordinator = PrinterStatusCoordinator(
+        hass, printer_manager, config_data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+    )
+
+    def is_healthy(name: str) -> bool:
+        if printer_manager.is_down(name):
+            return False
+        status = (coordinator.data or {}).get(name)
+        return status is None or status["status"] == "online"
+
+    router = GroupRouter(printer_manager.printers, is_healthy, job_manager.queue_depth)
+    router.load_groups_from_config(config_data.get(CONF_GROUPS, []))
+
     # Store the printer manager in hass data
     hass.data[DOMAIN] = {
         "printer_manager": printer_manager,
+        "job_manager": job_manager,
+        "coordinator": coordinator,
+        "router": router,
         "config": config_data,
     }
 
+    async def submit(target: str, data: bytes, job_id: Optional[str] = None) -> ServiceResponse:
+        """Queue compiled bytes for a printer or a group of printers."""
+        printers = router.resolve(target)
+        if job_id and len(printers) > 1:
+            # One job per printer, each needs an id of its own
+            jobs = [await job_manager.async_submit(printer, data, f"{job_id}-{printer}") for printer in printers]
+        else:
+            jobs = [await job_manager.async_submit(printer, data, job_id) for printer in printers]
+        response = {"job_id": jobs[0].job_id, "printer": jobs[0].printer_name}
+        if len(jobs) > 1:
+            response["job_ids"] = [job.job_id for job in jobs]
+        return response
+
     # Set up services
-    async def print_text_service(call: ServiceCall) -> None:
+    async def print_text_service(call: ServiceCall) -> ServiceResponse:
         """Service to print text."""
         printer = call.data.get("printer")
         text = call.data.get("text")
@@ -314,11 +489,9 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         if not printer or not text:
             raise HomeAssistantError("Printer name and text are required")
 
-        success = printer_manager.print_text(printer, text, headline)
-        if not success:
-            raise HomeAssistantError("Failed to print text")
+        return await submit(printer, printer_manager.render_text(text, headline), call.data.get("job_id"))
 
-    async def print_simple_service(call: ServiceCall) -> None:
+    async def print_simple_service(call: ServiceCall) -> ServiceResponse:
         """Service to print simple text."""
         text = call.data.get("text", "")
         printer = call.data.get("printer")
@@ -326,21 +499,38 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         if not text:
             raise HomeAssistantError("Text is required")
 
+        if not printer:
+            printer = config_data.get(CONF_DEFAULT_PRINTER)
         if not printer and printer_manager.printers:
             # Use first available printer
             printer = list(printer_manager.printers.keys())[0]
         elif not printer:
             raise HomeAssistantError("No printer configured")
 
-        success = printer_manager.print_text(printer, text)
-        if not success:
-            raise HomeAssistantError("Failed to print text")
+        return await submit(printer, printer_manager.render_text(text), call.data.get("job_id"))
+
+    async def print_batch_service(call: ServiceCall) -> ServiceResponse:
+        """Service to print several texts in one transmission."""
+        printer = call.data.get("printer")
+        jobs = call.data.get("jobs")
+
+        if not printer or not jobs:
+            raise HomeAssistantError("Printer name and jobs are required")
+
+        return await submit(
+            printer, printer_manager.render_batch(jobs, call.data.get("cut_between", False)), call.data.get("job_id")
+        )
+
+    async def discover_printers() -> List[Dict]:
+        return await printer_manager.async_discover_printers(
+            config_data.get(CONF_DISCOVERY_NETWORKS),
+            timeout=config_data.get(CONF_DISCOVERY_TIMEOUT, DEFAULT_DISCOVERY_TIMEOUT),
+            concurrency=config_data.get(CONF_DISCOVERY_CONCURRENCY, DEFAULT_CONCURRENCY),
+        )
 
     async def discover_printers_service(call: ServiceCall) -> None:
         """Service to discover printers."""
-        timeout = config_data.get(CONF_DISCOVERY_TIMEOUT, DEFAULT_DISCOVERY_TIMEOUT)
-        discovered = printer_manager.discover_printers(timeout)
-        _LOGGER.info(f"Discovery complete. Found {len(discovered)} printers")
+        await discover_printers()
 
     async def add_printer_service(call: ServiceCall) -> None:
         """Service to add a printer."""
@@ -351,10 +541,15 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         if not name or not host:
             raise HomeAssistantError("Name and host are required")
 
-        success = printer_manager.add_printer(name, host, port)
+        is_new = name not in printer_manager.printers
+        success = await printer_manager.async_add_printer(name, host, port)
         if not success:
             raise HomeAssistantError("Failed to add printer")
 
+        if is_new:
+            async_dispatcher_send(hass, SIGNAL_PRINTER_ADDED, name)
+        await coordinator.async_request_refresh()
+
     async def remove_printer_service(call: ServiceCall) -> None:
         """Service to remove a printer."""
         name = call.data.get("name")
@@ -362,21 +557,55 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         if not name:
             raise HomeAssistantError("Name is required")
 
-        success = printer_manager.remove_printer(name)
+        success = await printer_manager.async_remove_printer(name)
         if not success:
             raise HomeAssistantError("Printer not found")
 
+        async_dispatcher_send(hass, SIGNAL_PRINTER_REMOVED, name)
+
+    async def get_job_service(call: ServiceCall) -> ServiceResponse:
+        """Service to look up the state of a print job."""
+        job = await job_manager.async_get(call.data["job_id"])
+        if job is None:
+            raise HomeAssistantError("Job not found")
+        return job.as_dict()
+
     # Register services
-    hass.services.async_register(DOMAIN, SERVICE_PRINT_TEXT, print_text_service, schema=PRINT_TEXT_SCHEMA)
-    hass.services.async_register(DOMAIN, SERVICE_PRINT_SIMPLE, print_simple_service, schema=PRINT_SIMPLE_SCHEMA)
+    hass.services.async_register(
+        DOMAIN, SERVICE_PRINT_TEXT, print_text_service, schema=PRINT_TEXT_SCHEMA, supports_response=SupportsResponse.OPTIONAL
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PRINT_SIMPLE, print_simple_service, schema=PRINT_SIMPLE_SCHEMA, supports_response=SupportsResponse.OPTIONAL
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PRINT_BATCH, print_batch_service, schema=PRINT_BATCH_SCHEMA, supports_response=SupportsResponse.OPTIONAL
+    )
     hass.services.async_register(DOMAIN, SERVICE_DISCOVER_PRINTERS, discover_printers_service, schema=DISCOVER_PRINTERS_SCHEMA)
     hass.services.async_register(DOMAIN, SERVICE_ADD_PRINTER, add_printer_service, schema=ADD_PRINTER_SCHEMA)
     hass.services.async_register(DOMAIN, SERVICE_REMOVE_PRINTER, remove_printer_service, schema=REMOVE_PRINTER_SCHEMA)
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_JOB, get_job_service, schema=GET_JOB_SCHEMA, supports_response=SupportsResponse.ONLY
+    )
+
+    # Close pooled connections the printers haven't needed for a while
+    async def close_idle_connections(now: datetime) -> None:
+        await hass.async_add_executor_job(printer_manager.pool.close_idle)
+
+    async_track_time_interval(hass, close_idle_connections, timedelta(seconds=10))
+
+    async def close_connections(event: Event) -> None:
+        await job_manager.async_stop()
+        await hass.async_add_executor_job(printer_manager.pool.close_all)
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, close_connections)
+
+    # Status sensors, refreshed together by the coordinator
+    hass.async_create_task(async_load_platform(hass, "sensor", DOMAIN, {}, config))
 
-    # Initial discovery if enabled
+    # Initial discovery if enabled, without holding up startup
     if config_data.get(CONF_DISCOVERY_ENABLED, True):
         _LOGGER.info("Performing initial printer discovery...")
-        await hass.async_add_executor_job(printer_manager.discover_printers)
+        hass.async_create_task(discover_printers())
 
     return True
 
@@ -0,0 +1,96 @@
+"""Per-printer circuit breaker for the ESC/POS Printer integration."""
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from homeassistant.exceptions import HomeAssistantError
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_RESET_TIMEOUT = 30
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(HomeAssistantError):
+    """Raised instead of calling a printer that is known to be down."""
+
+
+class CircuitBreaker:
+    """Fails calls fast once a printer has failed repeatedly.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused without touching the network. Once ``reset_timeout``
+    seconds have passed, a single trial call is let through: success closes
+    the circuit again, failure keeps it open for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return closed, open or half_open."""
+        if self.failures < self.failure_threshold:
+            return STATE_CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until a call is let through again, 0 unless the circuit is open."""
+        if self.state != STATE_OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Return whether a call may go ahead, claiming the trial call if half open."""
+        with self._lock:
+            state = self.state
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        with self._lock:
+            if self.failures >= self.failure_threshold:
+                _LOGGER.info(f"{self.name} is reachable again, closing its circuit")
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold:
+                if self.failures == self.failure_threshold:
+                    _LOGGER.warning(f"{self.name} failed {self.failures} times, failing fast for {self.reset_timeout}s")
+                self.opened_at = time.monotonic()
+
+    def call(self, func: Callable[..., Any], *args) -> Any:
+        """Run ``func`` through the breaker."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unreachable, not trying again for now")
+        try:
+            result = func(*args)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,200 @@
+"""Persistent connection pool for ESC/POS network printers."""
+import logging
+import select
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from escpos.printer import Network
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT = 30
+DEFAULT_CONNECT_TIMEOUT = 10
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+
+T = TypeVar("T")
+
+
+def _enable_keepalive(sock: socket.socket) -> None:
+    """Turn on TCP keepalive so dead peers are noticed while idle."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Fine grained tuning is only available on some platforms
+    for option, value in (
+        ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+    ):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+def _is_alive(sock: socket.socket) -> bool:
+    """Check without blocking whether the peer still holds the connection."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return True
+        # Readable with no data means the printer closed its end
+        return sock.recv(1, socket.MSG_PEEK) != b""
+    except OSError:
+        return False
+
+
+class PooledConnection:
+    """A single long-lived connection to one printer.
+
+    Printers usually serve one client at a time, so each printer gets
+    exactly one connection and jobs take turns through ``lock``.
+    ``written`` tells whether the current job has sent any print data.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.printer: Optional[Network] = None
+        self.last_used = 0.0
+        self.written = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if a socket is currently held."""
+        return self.printer is not None
+
+    def acquire(self) -> Tuple[Network, bool]:
+        """Return a healthy printer and whether the connection was reused."""
+        if self.printer is not None and _is_alive(self.printer.device):
+            return self.printer, True
+
+        self.discard()
+        printer = Network(self.host, port=self.port, timeout=self.timeout)
+        printer.open()
+        _enable_keepalive(printer.device)
+        send = printer._raw
+
+        def _raw(msg: bytes) -> None:
+            # Set before sending, a write that fails halfway may still have reached the printer
+            self.written = True
+            send(msg)
+
+        printer._raw = _raw
+        self.printer = printer
+        _LOGGER.debug(f"Opened connection to {self.host}:{self.port}")
+        return printer, False
+
+    def discard(self) -> None:
+        """Close the socket, if any."""
+        if self.printer is None:
+            return
+        try:
+            self.printer.close()
+        except Exception as e:
+            _LOGGER.debug(f"Error closing connection to {self.host}:{self.port}: {e}")
+        self.printer = None
+
+
+class ConnectionPool:
+    """Keeps one connection per printer open between jobs."""
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._connections: Dict[Tuple[str, int], PooledConnection] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host: str, port: int) -> PooledConnection:
+        with self._lock:
+            key = (host, port)
+            if key not in self._connections:
+                self._connections[key] = PooledConnection(host, port, self.timeout)
+            return self._connections[key]
+
+    def run(self, host: str, port: int, job: Callable[[Network], T]) -> T:
+        """Run a job on the printer's connection.
+
+        A job that fails on a reused connection before sending any print
+        data is retried once on a fresh one, since a socket can pass the
+        health check and still turn out to be stale on first write. Once
+        data has gone out the error is raised, a second run could print
+        the receipt twice.
+        """
+        conn = self._get(host, port)
+        with conn.lock:
+            printer, reused = conn.acquire()
+            conn.written = False
+            try:
+                return job(printer)
+            except OSError as e:
+                conn.discard()
+                if not reused or conn.written:
+                    raise
+                _LOGGER.info(f"Stale connection to {host}:{port} ({e}), reconnecting")
+                printer, _ = conn.acquire()
+                try:
+                    return job(printer)
+                except Exception:
+                    conn.discard()
+                    raise
+            except Exception:
+                conn.discard()
+                raise
+            finally:
+                conn.last_used = time.monotonic()
+
+    def probe(self, host: str, port: int, query: Callable[[socket.socket], T]) -> T:
+        """Run a status query without keeping the printer's connection open for it.
+
+        An open pooled connection is used without counting as use, so it
+        still closes once idle; otherwise the query gets a connection of
+        its own that is closed straight after. Many printers take only one
+        client, polling must not hold the port between jobs.
+        """
+        conn = self._get(host, port)
+        with conn.lock:
+            if conn.printer is not None and _is_alive(conn.printer.device):
+                try:
+                    return query(conn.printer.device)
+                except OSError:
+                    conn.discard()
+                    raise
+        with socket.create_connection((host, port), timeout=self.timeout) as sock:
+            return query(sock)
+
+    def close_idle(self) -> None:
+        """Close connections that have been idle longer than the idle timeout."""
+        now = time.monotonic()
+        with self._lock:
+            connections = list(self._connections.values())
+
+        for conn in connections:
+            # Skip connections that are busy printing right now
+            if not conn.lock.acquire(blocking=False):
+                continue
+            try:
+                if conn.is_open and now - conn.last_used > self.idle_timeout:
+                    _LOGGER.debug(f"Closing idle connection to {conn.host}:{conn.port}")
+                    conn.discard()
+            finally:
+                conn.lock.release()
+
+    def close(self, host: str, port: int) -> None:
+        """Close and forget the connection to one printer."""
+        with self._lock:
+            conn = self._connections.pop((host, port), None)
+        if conn is not None:
+            with conn.lock:
+                conn.discard()
+
+    def close_all(self) -> None:
+        """Close every pooled connection."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            with conn.lock:
+                conn.discard()
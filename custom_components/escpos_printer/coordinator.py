@@ -0,0 +1,69 @@
+"""Shared status refresh for all configured printers."""
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Dict
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SCAN_INTERVAL = 30
+MAX_BACKOFF_FACTOR = 10
+MAX_JITTER = 2.0
+
+
+class PrinterStatusCoordinator(DataUpdateCoordinator):
+    """Refreshes every printer's status on one shared schedule.
+
+    Each tick probes all due printers concurrently, each after a small
+    random delay so the requests don't all leave at the same instant.
+    Printers that are offline are probed less and less often, up to
+    ``MAX_BACKOFF_FACTOR`` times the interval, and are back on the normal
+    schedule as soon as they answer again.
+    """
+
+    def __init__(self, hass: HomeAssistant, printer_manager, interval: int = DEFAULT_SCAN_INTERVAL):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="escpos_printer status",
+            update_interval=timedelta(seconds=interval),
+            always_update=False,
+        )
+        self.printer_manager = printer_manager
+        self.interval = interval
+        self._backoff: Dict[str, int] = {}
+        self._next_probe: Dict[str, float] = {}
+
+    async def _async_update_data(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        names = list(self.printer_manager.printers)
+        due = [name for name in names if self._next_probe.get(name, 0) <= now]
+
+        results = await asyncio.gather(*(self._async_probe(name) for name in due))
+
+        # Keep the last known status of printers that were not due this time
+        data = {name: status for name, status in (self.data or {}).items() if name in names}
+        for name, status in zip(due, results):
+            data[name] = status
+            self._schedule(name, status.get("online", False))
+        return data
+
+    async def _async_probe(self, name: str) -> Dict:
+        await asyncio.sleep(random.uniform(0, min(self.interval * 0.2, MAX_JITTER)))
+        return await self.hass.async_add_executor_job(self.printer_manager.get_printer_status, name)
+
+    def _schedule(self, name: str, online: bool) -> None:
+        if online:
+            self._backoff.pop(name, None)
+            self._next_probe.pop(name, None)
+            return
+
+        factor = min(self._backoff.get(name, 1) * 2, MAX_BACKOFF_FACTOR)
+        self._backoff[name] = factor
+        self._next_probe[name] = time.monotonic() + self.interval * factor
+        _LOGGER.debug(f"Printer {name} is offline, next probe in {self.interval * factor}s")
@@ -0,0 +1,250 @@
+"""Asynchronous network scanner for ESC/POS printers."""
+import asyncio
+import ipaddress
+import logging
+import math
+import socket
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .status import async_query_status
+
+_LOGGER = logging.getLogger(__name__)
+
+# Common ESC/POS printer ports
+DEFAULT_PORTS = [9100, 9101, 9102]
+DEFAULT_CONCURRENCY = 256
+PROBE_TIMEOUT = 0.5
+
+STORAGE_KEY = "escpos_printer.discovery"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+EVENT_DISCOVERY = "escpos_printer_discovery"
+CHANGE_ADDED = "added"
+CHANGE_CHANGED = "changed"
+CHANGE_REMOVED = "removed"
+
+# Known printers that stay unreachable this long are dropped from the index
+FORGET_AFTER = timedelta(days=7)
+
+
+def local_network() -> str:
+    """Return the /24 around this host's outbound address."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Nothing is sent, this only selects the outbound interface
+        s.connect(("8.8.8.8", 80))
+        local_ip = s.getsockname()[0]
+    finally:
+        s.close()
+    return str(ipaddress.ip_network(f"{local_ip}/24", strict=False))
+
+
+def _targets(networks: List[str], ports: List[int], exclude: Set[str]) -> Iterator[Tuple[str, int]]:
+    seen = {ipaddress.ip_address(host) for host in exclude}
+    for network in networks:
+        for ip in ipaddress.ip_network(network, strict=False).hosts():
+            if ip in seen:
+                continue
+            seen.add(ip)
+            for port in ports:
+                yield str(ip), port
+
+
+async def async_scan(
+    networks: List[str],
+    ports: Optional[List[int]] = None,
+    timeout: float = 5,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    probe_timeout: float = PROBE_TIMEOUT,
+    exclude: Optional[Set[str]] = None,
+) -> AsyncIterator[Dict]:
+    """Yield printers as they answer.
+
+    At most ``concurrency`` connects are in flight at once. The scan gets
+    the time its probes need at that concurrency, each taking up to
+    ``probe_timeout``, plus ``timeout`` seconds, so larger networks are
+    given longer. Probes still running when it stops are cancelled. Hosts
+    in ``exclude`` are skipped.
+    """
+    ports = ports or DEFAULT_PORTS
+    targets = _targets(networks, ports, exclude or set())
+    # An upper bound, excluded hosts are counted too
+    addresses = sum(ipaddress.ip_network(network, strict=False).num_addresses for network in networks)
+    budget = timeout + math.ceil(addresses * len(ports) / concurrency) * probe_timeout
+    semaphore = asyncio.Semaphore(concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    found = set()
+
+    async def probe(host: str, port: int) -> None:
+        try:
+            if host in found:
+                return
+            status = await async_query_status(host, port, probe_timeout)
+            # Report each host once, on the first printer port that answers
+            if status is not None and host not in found:
+                found.add(host)
+                results.put_nowait({"host": host, "port": port, "probe": status})
+        finally:
+            semaphore.release()
+
+    async def feed() -> None:
+        tasks = set()
+        try:
+            for host, port in targets:
+                await semaphore.acquire()
+                task = asyncio.ensure_future(probe(host, port))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+
+    feeder = asyncio.ensure_future(feed())
+    feeder.add_done_callback(lambda _: results.put_nowait(None))
+    deadline = time.monotonic() + budget
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _LOGGER.warning(f"Discovery stopped after {budget:.0f}s before the scan was complete")
+                break
+            try:
+                result = await asyncio.wait_for(results.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+            if result is None:
+                break
+            yield result
+    finally:
+        feeder.cancel()
+
+
+class DiscoveryIndex:
+    """Persisted record of printers found on the network.
+
+    Known printers are re-probed directly, which takes well under a second,
+    and the full sweep of the remaining addresses runs in the background.
+    Every change to the index is announced with an ``escpos_printer_discovery``
+    event whose ``change`` is ``added``, ``changed`` or ``removed``.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.hosts: Dict[str, Dict] = {}
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._loaded = False
+        self._sweep: Optional[asyncio.Task] = None
+
+    async def async_load(self) -> None:
+        """Load the index from storage once."""
+        if self._loaded:
+            return
+        data = await self._store.async_load()
+        if data:
+            self.hosts = data.get("hosts", {})
+        self._loaded = True
+
+    @property
+    def sweeping(self) -> bool:
+        """Return True while a background sweep is running."""
+        return self._sweep is not None and not self._sweep.done()
+
+    def printers(self) -> List[Dict]:
+        """Return the printers that answered their latest probe."""
+        return [
+            {
+                "host": entry["host"],
+                "port": entry["port"],
+                "name": f"Printer at {entry['host']}:{entry['port']}",
+                "status": "discovered",
+                "last_seen": entry["last_seen"],
+            }
+            for entry in self.hosts.values()
+            if entry["online"]
+        ]
+
+    async def async_refresh_known(self, probe_timeout: float = PROBE_TIMEOUT) -> None:
+        """Probe every known printer concurrently."""
+        entries = list(self.hosts.values())
+        results = await asyncio.gather(
+            *(async_query_status(entry["host"], entry["port"], probe_timeout) for entry in entries)
+        )
+        for entry, status in zip(entries, results):
+            self._record(entry["host"], entry["port"], status)
+        self._forget_stale()
+        self._save()
+
+    def async_start_sweep(
+        self,
+        networks: List[str],
+        timeout: float,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> None:
+        """Sweep the addresses not in the index in the background."""
+        if self.sweeping:
+            _LOGGER.debug("Discovery sweep already running")
+            return
+        self._sweep = self.hass.async_create_background_task(
+            self._async_sweep(networks, timeout, concurrency), f"{__name__} sweep"
+        )
+
+    async def _async_sweep(self, networks: List[str], timeout: float, concurrency: int) -> None:
+        known = {entry["host"] for entry in self.hosts.values()}
+        found = 0
+        async for result in async_scan(networks, timeout=timeout, concurrency=concurrency, exclude=known):
+            self._record(result["host"], result["port"], result["probe"])
+            found += 1
+            _LOGGER.info(f"Discovered printer at {result['host']}:{result['port']}")
+        self._save()
+        _LOGGER.info(f"Discovery sweep complete. Found {found} new printers")
+
+    def _record(self, host: str, port: int, probe: Optional[Dict]) -> None:
+        """Update an entry from a status probe, None meaning unreachable."""
+        key = f"{host}:{port}"
+        now = dt_util.utcnow().isoformat()
+        entry = self.hosts.get(key)
+        online = probe is not None
+
+        if entry is None:
+            if not online:
+                return
+            entry = self.hosts[key] = {
+                "host": host,
+                "port": port,
+                "first_seen": now,
+                "last_seen": now,
+                "online": True,
+                "probe": probe,
+            }
+            self._fire(CHANGE_ADDED, entry)
+            return
+
+        changed = entry["online"] != online or (online and entry.get("probe") != probe)
+        entry["online"] = online
+        if online:
+            entry["last_seen"] = now
+            entry["probe"] = probe
+        if changed:
+            self._fire(CHANGE_CHANGED, entry)
+
+    def _forget_stale(self) -> None:
+        cutoff = dt_util.utcnow() - FORGET_AFTER
+        for key, entry in list(self.hosts.items()):
+            if not entry["online"] and dt_util.parse_datetime(entry["last_seen"]) < cutoff:
+                del self.hosts[key]
+                self._fire(CHANGE_REMOVED, entry)
+
+    def _fire(self, change: str, entry: Dict) -> None:
+        self.hass.bus.async_fire(EVENT_DISCOVERY, {"change": change, **entry})
+
+    def _save(self) -> None:
+        self._store.async_delay_save(lambda: {"hosts": self.hosts}, SAVE_DELAY)
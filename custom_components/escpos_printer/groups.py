@@ -0,0 +1,75 @@
+"""Printer groups and how jobs are routed to their members."""
+import itertools
+import logging
+from typing import Callable, Dict, List
+
+from homeassistant.exceptions import HomeAssistantError
+
+_LOGGER = logging.getLogger(__name__)
+
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_LEAST_QUEUED = "least_queued"
+STRATEGY_FIRST_HEALTHY = "first_healthy"
+STRATEGY_BROADCAST = "broadcast"
+STRATEGIES = [STRATEGY_ROUND_ROBIN, STRATEGY_LEAST_QUEUED, STRATEGY_FIRST_HEALTHY, STRATEGY_BROADCAST]
+
+
+class PrinterGroup:
+    """A named set of printers sharing one routing strategy."""
+
+    def __init__(self, name: str, members: List[str], strategy: str = STRATEGY_ROUND_ROBIN):
+        self.name = name
+        self.members = members
+        self.strategy = strategy
+        self._turn = itertools.count()
+
+
+class GroupRouter:
+    """Resolves a printer or group name to the printers a job goes to.
+
+    Members known to be offline are skipped as long as another member is
+    healthy; printers without a status reading yet count as healthy.
+    """
+
+    def __init__(
+        self,
+        printers: Dict[str, Dict],
+        is_healthy: Callable[[str], bool],
+        queue_depth: Callable[[str], int],
+    ):
+        self.printers = printers
+        self.is_healthy = is_healthy
+        self.queue_depth = queue_depth
+        self.groups: Dict[str, PrinterGroup] = {}
+
+    def load_groups_from_config(self, groups_config: List[Dict]) -> None:
+        """Load groups from configuration."""
+        for group_config in groups_config:
+            group = PrinterGroup(group_config["name"], group_config["members"], group_config["strategy"])
+            if group.name in self.printers:
+                _LOGGER.warning(f"Group {group.name} has the same name as a printer, the printer wins")
+            self.groups[group.name] = group
+            _LOGGER.info(f"Loaded printer group {group.name} ({group.strategy}): {', '.join(group.members)}")
+
+    def resolve(self, target: str) -> List[str]:
+        """Return the printers a job for ``target`` should be sent to."""
+        if target in self.printers:
+            return [target]
+
+        group = self.groups.get(target)
+        if group is None:
+            raise HomeAssistantError(f"Printer or group '{target}' not found")
+
+        members = [name for name in group.members if name in self.printers]
+        if not members:
+            raise HomeAssistantError(f"Printer group '{target}' has no configured printers")
+
+        if group.strategy == STRATEGY_BROADCAST:
+            return members
+
+        healthy = [name for name in members if self.is_healthy(name)] or members
+        if group.strategy == STRATEGY_FIRST_HEALTHY:
+            return [healthy[0]]
+        if group.strategy == STRATEGY_LEAST_QUEUED:
+            return [min(healthy, key=self.queue_depth)]
+        return [healthy[next(group._turn) % len(healthy)]]
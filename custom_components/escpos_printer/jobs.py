@@ -0,0 +1,338 @@
+"""Per-printer print job queues for the ESC/POS Printer integration."""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .metrics import Metrics
+from .spool import Spool
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_JOB_FINISHED = "escpos_printer_job_finished"
+
+DEFAULT_MAX_QUEUE_DEPTH = 50
+DEFAULT_JOB_HISTORY = 200
+DEFAULT_COALESCE_WINDOW = 0.1
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 5
+MAX_RETRY_DELAY = 120
+MAX_BATCH_JOBS = 50
+
+OVERFLOW_REJECT = "reject"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_POLICIES = [OVERFLOW_REJECT, OVERFLOW_DROP_OLDEST]
+
+JOB_QUEUED = "queued"
+JOB_PRINTING = "printing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_DROPPED = "dropped"
+
+
+class QueueFullError(HomeAssistantError):
+    """Raised when a printer's queue is full and the policy is to reject."""
+
+
+class PrintJob:
+    """Compiled ESC/POS bytes waiting for one printer."""
+
+    def __init__(self, printer_name: str, data: bytes, job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.printer_name = printer_name
+        self.data = data
+        self.status = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.failed_over_from: Optional[str] = None
+        self.created = datetime.now()
+        self.finished: Optional[datetime] = None
+
+    @classmethod
+    def from_spool(cls, row: Dict) -> "PrintJob":
+        """Rebuild a job from its spool record."""
+        job = cls(row["printer"], row.get("data"), job_id=row["job_id"])
+        job.status = row["status"]
+        job.error = row["error"]
+        job.created = datetime.fromtimestamp(row["created"])
+        job.finished = datetime.fromtimestamp(row["finished"]) if row["finished"] else None
+        return job
+
+    def as_dict(self) -> Dict:
+        """Return a serializable view of the job."""
+        return {
+            "job_id": self.job_id,
+            "printer": self.printer_name,
+            "status": self.status,
+            "attempts": self.attempts,
+            "failed_over_from": self.failed_over_from,
+            "error": self.error,
+            "created": self.created.isoformat(),
+            "finished": self.finished.isoformat() if self.finished else None,
+        }
+
+
+class JobManager:
+    """Runs one bounded queue and one worker per printer.
+
+    Jobs for the same printer run strictly in submission order, while
+    different printers are served by independent workers in parallel.
+    The blocking send runs in the executor so the event loop never waits
+    on the network.
+
+    Jobs that arrive for a printer within ``coalesce_window`` seconds of
+    each other are concatenated and sent as one transmission.
+
+    With a ``spool``, jobs are written to disk before they are queued and
+    marked once sent, and ``async_start`` queues whatever a restart cut
+    short. Submitting a job id that is already known returns that job.
+
+    Failed jobs are retried after ``retry_delay`` seconds, doubling up to
+    ``MAX_RETRY_DELAY``, at most ``retry_attempts`` times. The printer's
+    worker waits for the retry, so later jobs never print before it. A
+    retry never comes before ``retry_in`` says the printer's circuit lets
+    a call through again, and a send the open circuit turns away is not
+    counted as an attempt. A job whose printer ``is_down`` moves to the
+    printer's backup from ``backup_for`` instead, if it has one, in the
+    spool too.
+
+    Finished jobs, retries and failovers are counted per printer in
+    ``metrics``.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        send: Callable[[str, bytes], bool],
+        max_depth: int = DEFAULT_MAX_QUEUE_DEPTH,
+        overflow: str = OVERFLOW_REJECT,
+        coalesce_window: float = DEFAULT_COALESCE_WINDOW,
+        history: int = DEFAULT_JOB_HISTORY,
+        spool: Optional[Spool] = None,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        backup_for: Callable[[str], Optional[str]] = lambda name: None,
+        is_down: Callable[[str], bool] = lambda name: False,
+        retry_in: Callable[[str], float] = lambda name: 0,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.hass = hass
+        self.send = send
+        self.spool = spool
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.backup_for = backup_for
+        self.is_down = is_down
+        self.retry_in = retry_in
+        self.metrics = metrics or Metrics()
+        self.max_depth = max_depth
+        self.overflow = overflow
+        self.coalesce_window = coalesce_window
+        self.history = history
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._jobs: "OrderedDict[str, PrintJob]" = OrderedDict()
+
+    def _queue(self, printer_name: str) -> asyncio.Queue:
+        if printer_name not in self._queues:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_depth)
+            self._queues[printer_name] = queue
+            self._workers[printer_name] = self.hass.async_create_background_task(
+                self._worker(printer_name, queue), f"{__name__} {printer_name}"
+            )
+        return self._queues[printer_name]
+
+    async def async_start(self) -> None:
+        """Queue the spooled jobs that were not confirmed printed before the last stop."""
+        if not self.spool:
+            return
+        rows = await self.hass.async_add_executor_job(self.spool.pending)
+        for row in rows:
+            job = PrintJob.from_spool(row)
+            job.status = JOB_QUEUED
+            try:
+                self._enqueue(job)
+            except QueueFullError:
+                # Still pending in the spool, it gets another chance on the next start
+                _LOGGER.warning(f"Print queue for {job.printer_name} is full, not replaying job {job.job_id}")
+        if rows:
+            _LOGGER.info(f"Replayed {len(rows)} spooled print jobs")
+
+    async def async_submit(self, printer_name: str, data: bytes, job_id: Optional[str] = None) -> PrintJob:
+        """Queue compiled ESC/POS bytes and return the job without waiting for it to print."""
+        if job_id:
+            existing = await self.async_get(job_id)
+            if existing is not None:
+                return existing
+
+        job = PrintJob(printer_name, data, job_id)
+        if self.spool and not await self.hass.async_add_executor_job(
+            self.spool.add, job.job_id, printer_name, data
+        ):
+            # Spooled by a concurrent submit with the same id
+            return await self.async_get(job.job_id)
+
+        try:
+            self._enqueue(job)
+        except QueueFullError:
+            await self._async_record([job], JOB_FAILED, "Print queue full")
+            raise
+        return job
+
+    def _enqueue(self, job: PrintJob) -> None:
+        queue = self._queue(job.printer_name)
+        if queue.full():
+            if self.overflow == OVERFLOW_REJECT:
+                raise QueueFullError(f"Print queue for {job.printer_name} is full")
+            dropped: PrintJob = queue.get_nowait()
+            queue.task_done()
+            self._finish(dropped, JOB_DROPPED, "Dropped to make room for newer jobs")
+            self.hass.async_create_task(self._async_record([dropped], JOB_DROPPED, dropped.error))
+            _LOGGER.warning(f"Print queue for {job.printer_name} is full, dropped job {dropped.job_id}")
+
+        queue.put_nowait(job)
+        self._remember(job)
+
+    def get(self, job_id: str) -> Optional[PrintJob]:
+        """Look up a queued or recently finished job."""
+        return self._jobs.get(job_id)
+
+    async def async_get(self, job_id: str) -> Optional[PrintJob]:
+        """Look up a job, falling back to the spool for older ones."""
+        job = self.get(job_id)
+        if job is None and self.spool:
+            row = await self.hass.async_add_executor_job(self.spool.get, job_id)
+            if row:
+                job = PrintJob.from_spool(row)
+        return job
+
+    def queue_depth(self, printer_name: str) -> int:
+        """Return the number of jobs waiting for a printer."""
+        queue = self._queues.get(printer_name)
+        return queue.qsize() if queue else 0
+
+    async def async_stop(self) -> None:
+        """Cancel all workers, pending retries included, and close the spool."""
+        # Jobs waiting for a retry are still pending in the spool
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        if self.spool:
+            await self.hass.async_add_executor_job(self.spool.close)
+
+    async def _worker(self, printer_name: str, queue: asyncio.Queue) -> None:
+        while True:
+            batch: List[PrintJob] = [await queue.get()]
+
+            # Give a burst of jobs a moment to arrive so they share one write
+            if self.coalesce_window > 0:
+                await asyncio.sleep(self.coalesce_window)
+            while not queue.empty() and len(batch) < MAX_BATCH_JOBS:
+                batch.append(queue.get_nowait())
+
+            taken = len(batch)
+            try:
+                # Later jobs wait while a failed batch is retried, so they can't overtake it
+                while batch:
+                    batch = await self._send_batch(printer_name, batch)
+            finally:
+                for _ in range(taken):
+                    queue.task_done()
+
+    async def _send_batch(self, printer_name: str, batch: List[PrintJob]) -> List[PrintJob]:
+        """Send a batch in one write, return the jobs to send again once their retry delay is over."""
+        # An open circuit turns the batch away without sending it
+        refused = self.retry_in(printer_name) > 0
+        for job in batch:
+            job.status = JOB_PRINTING
+            if not refused:
+                job.attempts += 1
+        data = b"".join(job.data for job in batch)
+
+        try:
+            result = await self.hass.async_add_executor_job(self.send, printer_name, data)
+            if result is False:
+                status, error = JOB_FAILED, "Printer unreachable"
+            else:
+                status, error = JOB_DONE, None
+        except Exception as e:
+            _LOGGER.error(f"Print batch of {len(batch)} jobs for {printer_name} failed: {e}")
+            status, error = JOB_FAILED, str(e)
+
+        if len(batch) > 1:
+            _LOGGER.debug(f"Sent {len(batch)} jobs to {printer_name} in one transmission")
+        retry: List[PrintJob] = []
+        if status == JOB_FAILED:
+            # Jobs that fail over or get another try are not finished yet
+            batch = [job for job in batch if not await self._async_failover(job, error)]
+            retry = [job for job in batch if job.attempts <= self.retry_attempts]
+            batch = [job for job in batch if job.attempts > self.retry_attempts]
+        await self._async_record(batch, status, error)
+        for job in batch:
+            self._finish(job, status, error)
+
+        if retry:
+            attempts = max(job.attempts for job in retry)
+            delay = min(self.retry_delay * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+            # Retrying before the circuit lets a call through again would only be turned away
+            delay = max(delay, self.retry_in(printer_name))
+            _LOGGER.info(f"Print of {len(retry)} jobs for {printer_name} failed ({error}), retrying in {delay:.0f}s")
+            for job in retry:
+                job.status = JOB_QUEUED
+                job.error = error
+                self.metrics.inc("retries_total", printer=printer_name)
+            await asyncio.sleep(delay)
+        return retry
+
+    async def _async_failover(self, job: PrintJob, error: str) -> bool:
+        """Move a job to its printer's backup if the printer is down, return whether it moved."""
+        backup = self.backup_for(job.printer_name)
+        if not backup or job.failed_over_from or not self.is_down(job.printer_name):
+            return False
+        _LOGGER.warning(f"Printer {job.printer_name} is down, sending job {job.job_id} to {backup}")
+        job.error = error
+        job.status = JOB_QUEUED
+        job.failed_over_from, job.printer_name = job.printer_name, backup
+        try:
+            self._enqueue(job)
+        except QueueFullError:
+            job.printer_name, job.failed_over_from = job.failed_over_from, None
+            return False
+        self.metrics.inc("failovers_total", printer=job.failed_over_from)
+        if self.spool:
+            try:
+                await self.hass.async_add_executor_job(self.spool.reassign, job.job_id, backup)
+            except Exception as e:
+                _LOGGER.error(f"Could not record the failover of print job {job.job_id} in the spool: {e}")
+        return True
+
+    async def _async_record(self, jobs: List[PrintJob], status: str, error: Optional[str] = None) -> None:
+        if not self.spool:
+            return
+        try:
+            await self.hass.async_add_executor_job(self.spool.mark, [job.job_id for job in jobs], status, error)
+        except Exception as e:
+            _LOGGER.error(f"Could not record {len(jobs)} print jobs in the spool: {e}")
+
+    def _remember(self, job: PrintJob) -> None:
+        self._jobs[job.job_id] = job
+        # Forget the oldest finished jobs once the history is full
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.finished is None:
+                break
+            self._jobs.popitem(last=False)
+
+    def _finish(self, job: PrintJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished = datetime.now()
+        self.metrics.inc("jobs_total", printer=job.printer_name, status=status)
+        self.hass.bus.async_fire(EVENT_JOB_FINISHED, job.as_dict())
@@ -0,0 +1,150 @@
+"""Per-printer timers and counters for the ESC/POS Printer integration."""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PREFIX = "escpos"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Durations of one timer, bucketed like a Prometheus histogram."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """Counters, gauges and timers, keyed by name and labels.
+
+    Recording is a dict update under a lock, cheap enough for the print
+    path. ``snapshot`` flattens the series of one printer into a dict for
+    its sensor's attributes, ``render`` writes everything in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, prefix: str = DEFAULT_PREFIX, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._timers: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, text: str) -> None:
+        """Set the help text of a metric."""
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one duration of a timer."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._timers.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self.buckets)
+            series[key].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the block, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self, **match) -> Dict[str, float]:
+        """Return the series carrying all ``match`` labels as a flat dict.
+
+        Counters are named after the metric and their other label values,
+        e.g. ``jobs_done``, timers after their other label values, e.g.
+        ``send_avg_ms`` and ``send_max_ms``.
+        """
+        wanted = set(_labels(match))
+        result: Dict[str, float] = {}
+        with self._lock:
+            for kind in (self._counters, self._gauges):
+                for name, series in kind.items():
+                    base = name[: -len("_total")] if name.endswith("_total") else name
+                    for labels, value in series.items():
+                        if wanted <= set(labels):
+                            rest = [v for k, v in labels if (k, v) not in wanted]
+                            result["_".join([base] + rest)] = value
+            for name, series in self._timers.items():
+                for labels, histogram in series.items():
+                    if wanted <= set(labels) and histogram.count:
+                        rest = [v for k, v in labels if (k, v) not in wanted] or [name]
+                        key = "_".join(rest)
+                        result[f"{key}_avg_ms"] = round(histogram.sum / histogram.count * 1000, 1)
+                        result[f"{key}_max_ms"] = round(histogram.max * 1000, 1)
+        return result
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text format."""
+        lines: List[str] = []
+        with self._lock:
+            for kind, series_by_name in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(series_by_name.items()):
+                    full = f"{self.prefix}_{name}"
+                    self._header(lines, name, full, kind)
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{full}{_format(labels)} {value}")
+
+            for name, series in sorted(self._timers.items()):
+                full = f"{self.prefix}_{name}"
+                self._header(lines, name, full, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{_format(labels, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{full}_bucket{_format(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{full}_sum{_format(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{full}_count{_format(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, full: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {full} {self._help[name]}")
+        lines.append(f"# TYPE {full} {kind}")
@@ -0,0 +1,92 @@
+"""Status sensors for ESC/POS printers."""
+from typing import Any, Dict, Optional
+
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from . import DOMAIN, SIGNAL_PRINTER_ADDED, SIGNAL_PRINTER_REMOVED
+from .coordinator import PrinterStatusCoordinator
+from .metrics import Metrics
+
+STATUS_ATTRIBUTES = ["online", "paper_low", "paper_out", "cover_open", "error", "reason"]
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: Optional[DiscoveryInfoType] = None,
+) -> None:
+    """Set up a status sensor for every printer."""
+    if discovery_info is None:
+        return
+
+    coordinator: PrinterStatusCoordinator = hass.data[DOMAIN]["coordinator"]
+    printer_manager = hass.data[DOMAIN]["printer_manager"]
+    metrics = printer_manager.metrics
+    async_add_entities(PrinterEntity(coordinator, name, metrics) for name in printer_manager.printers)
+
+    @callback
+    def add_printer(name: str) -> None:
+        async_add_entities([PrinterEntity(coordinator, name, metrics)])
+
+    async_dispatcher_connect(hass, SIGNAL_PRINTER_ADDED, add_printer)
+
+
+class PrinterEntity(CoordinatorEntity, SensorEntity):
+    """Representation of a printer entity."""
+
+    def __init__(self, coordinator: PrinterStatusCoordinator, printer_name: str, metrics: Metrics):
+        super().__init__(coordinator)
+        self._printer_name = printer_name
+        self._metrics = metrics
+        self._status: Optional[Dict] = None
+        self._stats: Dict[str, Any] = {}
+        self._attr_unique_id = f"{DOMAIN}_{printer_name}"
+
+    @property
+    def name(self):
+        """Return the name of the printer."""
+        return f"Printer {self._printer_name}"
+
+    @property
+    def native_value(self):
+        """Return the state of the printer."""
+        if self._status is None:
+            return "unknown"
+        return self._status["status"]
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        """Return the detailed status fields, job counters and stage timings."""
+        if self._status is None:
+            return dict(self._stats)
+        return {**{key: self._status[key] for key in STATUS_ATTRIBUTES if key in self._status}, **self._stats}
+
+    async def async_added_to_hass(self) -> None:
+        """Pick up the latest status and listen for removal."""
+        await super().async_added_to_hass()
+        self._status = (self.coordinator.data or {}).get(self._printer_name)
+        self._stats = self._metrics.snapshot(printer=self._printer_name)
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_PRINTER_REMOVED, self._async_printer_removed)
+        )
+
+    async def _async_printer_removed(self, name: str) -> None:
+        if name == self._printer_name:
+            await self.async_remove()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only if this printer's status or counters changed."""
+        status = (self.coordinator.data or {}).get(self._printer_name)
+        stats = self._metrics.snapshot(printer=self._printer_name)
+        if status == self._status and stats == self._stats:
+            return
+        self._status = status
+        self._stats = stats
+        self.async_write_ha_state()
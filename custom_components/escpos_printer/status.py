@@ -0,0 +1,163 @@
+"""ESC/POS real-time status queries."""
+import asyncio
+import logging
+import select
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STATUS_TIMEOUT = 0.5
+DEFAULT_STATUS_TTL = 5
+
+# DLE EOT n: printer status, offline cause, error cause, paper roll sensor.
+# Real-time commands are answered immediately, even with print data buffered.
+STATUS_QUERY = b"\x10\x04\x01\x10\x04\x02\x10\x04\x03\x10\x04\x04"
+STATUS_RESPONSE_LENGTH = 4
+
+STATUS_ONLINE = "online"
+STATUS_OFFLINE = "offline"
+STATUS_PAPER_OUT = "paper_out"
+STATUS_COVER_OPEN = "cover_open"
+STATUS_ERROR = "error"
+
+
+def _valid(byte: int) -> bool:
+    # Every status byte has bits 1 and 4 set and bits 0 and 7 clear
+    return byte & 0x93 == 0x12
+
+
+def parse_status(response: bytes) -> Dict:
+    """Turn the answers to ``STATUS_QUERY`` into structured fields.
+
+    Printers that don't implement real-time status send nothing back; they
+    are reported online with the detailed fields left as None.
+    """
+    status: Dict = {
+        "status": STATUS_ONLINE,
+        "online": True,
+        "paper_low": None,
+        "paper_out": None,
+        "cover_open": None,
+        "error": None,
+    }
+    if len(response) < STATUS_RESPONSE_LENGTH or not all(_valid(byte) for byte in response[:STATUS_RESPONSE_LENGTH]):
+        if response:
+            _LOGGER.debug(f"Unexpected status response {response.hex()}")
+        return status
+
+    printer, offline, error, paper = response[:STATUS_RESPONSE_LENGTH]
+    status["online"] = not printer & 0x08
+    status["cover_open"] = bool(offline & 0x04)
+    status["paper_out"] = bool(offline & 0x20 or paper & 0x60)
+    status["paper_low"] = bool(paper & 0x0C)
+    status["error"] = bool(offline & 0x40 or error & 0x6C)
+
+    if status["cover_open"]:
+        status["status"] = STATUS_COVER_OPEN
+    elif status["paper_out"]:
+        status["status"] = STATUS_PAPER_OUT
+    elif status["error"]:
+        status["status"] = STATUS_ERROR
+    elif not status["online"]:
+        status["status"] = STATUS_OFFLINE
+    return status
+
+
+def offline_status(error: str) -> Dict:
+    """Status for a printer that could not be reached."""
+    return {
+        "status": STATUS_OFFLINE,
+        "online": False,
+        "paper_low": None,
+        "paper_out": None,
+        "cover_open": None,
+        "error": None,
+        "reason": error,
+    }
+
+
+def query_status(sock: socket.socket, timeout: float = DEFAULT_STATUS_TIMEOUT) -> Dict:
+    """Query status over an open blocking socket."""
+    # Drop anything unsolicited so it isn't mistaken for our answer
+    while select.select([sock], [], [], 0)[0]:
+        if not sock.recv(64):
+            raise ConnectionError("Printer closed the connection")
+
+    sock.sendall(STATUS_QUERY)
+    response = b""
+    deadline = time.monotonic() + timeout
+    while len(response) < STATUS_RESPONSE_LENGTH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+            break
+        chunk = sock.recv(STATUS_RESPONSE_LENGTH - len(response))
+        if not chunk:
+            raise ConnectionError("Printer closed the connection")
+        response += chunk
+    return parse_status(response)
+
+
+async def async_query_status(host: str, port: int, timeout: float = DEFAULT_STATUS_TIMEOUT) -> Optional[Dict]:
+    """Query status over a one-shot connection, None if it can't connect."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    response = b""
+    try:
+        writer.write(STATUS_QUERY)
+        await writer.drain()
+        deadline = time.monotonic() + timeout
+        while len(response) < STATUS_RESPONSE_LENGTH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            chunk = await asyncio.wait_for(reader.read(STATUS_RESPONSE_LENGTH - len(response)), remaining)
+            if not chunk:
+                break
+            response += chunk
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return parse_status(response)
+
+
+class StatusCache:
+    """Caches status per printer for a short time.
+
+    ``fetch`` does the actual query; repeated reads within ``ttl`` seconds
+    are answered from memory.
+    """
+
+    def __init__(self, fetch: Callable[[str, int], Dict], ttl: float = DEFAULT_STATUS_TTL):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, int], Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int, max_age: Optional[float] = None) -> Dict:
+        """Return a cached status or query the printer."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            cached = self._cache.get((host, port))
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+
+        status = self.fetch(host, port)
+        with self._lock:
+            self._cache[(host, port)] = (time.monotonic(), status)
+        return status
+
+    def invalidate(self, host: str, port: int) -> None:
+        """Forget the cached status of a printer."""
+        with self._lock:
+            self._cache.pop((host, port), None)
@@ -0,0 +1,107 @@
+"""Fetch-then-render pipeline for the printed news digest."""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import Metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SECTION_TIMEOUT = 10
+DEFAULT_DEADLINE = 20
+
+
+class Section:
+    """A digest section: a blocking fetch and a render of its result.
+
+    ``fallback`` is printed in place of the section if rendering it fails.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[], Any],
+        render: Callable[[Any, Any], None],
+        timeout: float = DEFAULT_SECTION_TIMEOUT,
+        fallback: Optional[str] = None,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.render = render
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+def _timed_fetch(section: Section, metrics: Metrics) -> Any:
+    with metrics.timer("stage_seconds", stage="fetch", source=section.name):
+        return section.fetch()
+
+
+def fetch_sections(
+    sections: List[Section], deadline: float = DEFAULT_DEADLINE, metrics: Optional[Metrics] = None
+) -> Dict[str, Any]:
+    """Fetch all sections in parallel.
+
+    Every fetch starts at once. A section is dropped from the result if it
+    raises, exceeds its own timeout or is still running when the shared
+    deadline passes, so the total wait is bounded by the slowest source.
+    With ``metrics``, every fetch is timed per section and dropped
+    sections are counted.
+    """
+    started = time.monotonic()
+    results: Dict[str, Any] = {}
+    if not sections:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=len(sections), thread_name_prefix="digest")
+    try:
+        futures = [
+            (section, executor.submit(_timed_fetch, section, metrics) if metrics else executor.submit(section.fetch))
+            for section in sections
+        ]
+        for section, future in futures:
+            remaining = started + min(section.timeout, deadline) - time.monotonic()
+            try:
+                results[section.name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                future.cancel()
+                _LOGGER.warning(f"Section {section.name} timed out, skipping it")
+                if metrics:
+                    metrics.inc("section_failures_total", source=section.name, reason="timeout")
+            except Exception as e:
+                _LOGGER.warning(f"Section {section.name} failed: {e}")
+                if metrics:
+                    metrics.inc("section_failures_total", source=section.name, reason="error")
+    finally:
+        # Don't wait for stragglers, their results are no longer wanted
+        executor.shutdown(wait=False)
+
+    _LOGGER.info(f"Fetched {len(results)}/{len(sections)} sections in {time.monotonic() - started:.2f}s")
+    return results
+
+
+def render_sections(
+    printer, sections: List[Section], results: Dict[str, Any], metrics: Optional[Metrics] = None
+) -> None:
+    """Render the fetched sections to the printer in their configured order.
+
+    A section whose render raises is logged and replaced by its fallback
+    text, the rest of the digest still prints.
+    """
+    for section in sections:
+        if section.name not in results:
+            continue
+        try:
+            if metrics:
+                with metrics.timer("stage_seconds", stage="render", source=section.name):
+                    section.render(printer, results[section.name])
+            else:
+                section.render(printer, results[section.name])
+        except Exception as e:
+            _LOGGER.warning(f"Section {section.name} could not be rendered: {e}")
+            if metrics:
+                metrics.inc("section_failures_total", source=section.name, reason="render")
+            if section.fallback:
+                printer.text(section.fallback)
@@ -0,0 +1,244 @@
+"""YAML digest layouts over a registry of cached data sources."""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from digest import DEFAULT_DEADLINE, DEFAULT_SECTION_TIMEOUT, Section, fetch_sections, render_sections
+from metrics import Metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+SOURCE_SETTINGS = ("ttl", "concurrency", "timeout")
+
+Params = Tuple[Tuple[str, Any], ...]
+
+
+def freeze(value: Any) -> Any:
+    """Return a hashable equivalent of a value parsed from YAML."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Source:
+    """One kind of digest data: how it is fetched, rendered and cached.
+
+    A fetch result is kept for ``ttl`` seconds per set of fetch
+    parameters, so digests built within that time share it, and at most
+    ``concurrency`` fetches of this source run at once. A fetch that is
+    already running is waited for instead of started again. Layout
+    sections pass ``fetch_params`` to ``fetch`` and ``render_params`` to
+    ``render``; only the former decide whether two sections are the same
+    fetch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[..., Any],
+        render: Callable[..., None],
+        ttl: float = 0,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_SECTION_TIMEOUT,
+        fetch_params: Iterable[str] = (),
+        render_params: Iterable[str] = (),
+    ):
+        self.name = name
+        self._fetch = fetch
+        self.render = render
+        self.fetch_params = tuple(fetch_params)
+        self.render_params = tuple(render_params)
+        self.timeout = timeout
+        self.ttl = ttl
+        self.configure(concurrency=concurrency)
+        self._results: Dict[Params, Tuple[float, Any]] = {}
+        self._running: Dict[Params, Future] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, ttl: Optional[float] = None, concurrency: Optional[int] = None, timeout: Optional[float] = None) -> None:
+        """Override the cache TTL, fetch concurrency or timeout."""
+        if ttl is not None:
+            self.ttl = float(ttl)
+        if concurrency is not None:
+            self.concurrency = int(concurrency)
+            self._slots = threading.BoundedSemaphore(self.concurrency)
+        if timeout is not None:
+            self.timeout = float(timeout)
+
+    def fetch(self, params: Dict[str, Any], refresh: bool = False) -> Any:
+        """Return the data for ``params``, from the cache while it is fresh unless ``refresh`` is set."""
+        key = freeze(params)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and not refresh and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            running = self._running.get(key)
+            if running is None:
+                self._running[key] = Future()
+        if running is not None:
+            return running.result()
+
+        try:
+            with self._slots:
+                data = self._fetch(**params)
+        except BaseException as e:
+            with self._lock:
+                self._running.pop(key).set_exception(e)
+            raise
+        with self._lock:
+            self._results[key] = (time.monotonic(), data)
+            self._running.pop(key).set_result(data)
+        return data
+
+
+class SourceRegistry:
+    """The sources layouts can use, by name."""
+
+    def __init__(self):
+        self.sources: Dict[str, Source] = {}
+
+    def register(self, name: str, fetch: Callable[..., Any], render: Callable[..., None], **kwargs) -> Source:
+        """Add a source, see ``Source`` for the keyword arguments."""
+        source = Source(name, fetch, render, **kwargs)
+        self.sources[name] = source
+        return source
+
+    def get(self, name: Optional[str]) -> Source:
+        """Return a source, raising ValueError for unknown names."""
+        if name not in self.sources:
+            raise ValueError(f"Unknown digest source {name!r}, expected one of {', '.join(self.sources)}")
+        return self.sources[name]
+
+
+class LayoutSection:
+    """A source with the parameters one layout gives it, and the text printed if it can't be rendered."""
+
+    def __init__(
+        self,
+        source: Source,
+        fetch_params: Dict[str, Any],
+        render_params: Dict[str, Any],
+        fallback: Optional[str] = None,
+    ):
+        self.source = source
+        self.fetch_params = fetch_params
+        self.params: Params = freeze(fetch_params)
+        self.render_params = render_params
+        self.fallback = fallback
+
+    @property
+    def key(self) -> str:
+        """Name of the fetch, the same for every section with this source and fetch parameters."""
+        if not self.params:
+            return self.source.name
+        return f"{self.source.name}({', '.join(f'{key}={value}' for key, value in self.params)})"
+
+
+class DigestLayout:
+    """A named digest: the printer it goes to and its sections in paper order."""
+
+    def __init__(self, name: str, printer: str, sections: List[LayoutSection]):
+        self.name = name
+        self.printer = printer
+        self.sections = sections
+
+
+def parse_layouts(config: Dict, registry: SourceRegistry, default_printer: str) -> Dict[str, DigestLayout]:
+    """Build layouts from a parsed layout config, raising ValueError if it is invalid.
+
+    The config has ``digests``, each with an optional ``printer`` and a
+    list of ``sections`` that name their ``source`` and its parameters
+    and may give a ``fallback`` text printed if the section fails to
+    render, and optionally ``sources`` to override a source's ``ttl``,
+    ``concurrency`` or ``timeout``.
+    """
+    for name, settings in (config.get("sources") or {}).items():
+        unknown = set(settings) - set(SOURCE_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown settings for source {name}: {', '.join(sorted(unknown))}")
+        registry.get(name).configure(**settings)
+
+    digests = config.get("digests") or {}
+    if not digests:
+        raise ValueError("The layout config has no digests")
+
+    layouts: Dict[str, DigestLayout] = {}
+    for name, digest in digests.items():
+        sections = []
+        for entry in (digest or {}).get("sections") or []:
+            entry = dict(entry)
+            source = registry.get(entry.pop("source", None))
+            fallback = entry.pop("fallback", None)
+            unknown = set(entry) - set(source.fetch_params) - set(source.render_params)
+            if unknown:
+                raise ValueError(f"Unknown parameters for {source.name} in digest {name}: {', '.join(sorted(unknown))}")
+            sections.append(LayoutSection(
+                source,
+                {key: value for key, value in entry.items() if key in source.fetch_params},
+                {key: value for key, value in entry.items() if key in source.render_params},
+                fallback=f"{fallback}\n\n" if fallback else None,
+            ))
+        if not sections:
+            raise ValueError(f"Digest {name} has no sections")
+        layouts[name] = DigestLayout(name, str((digest or {}).get("printer") or default_printer), sections)
+    return layouts
+
+
+def load_layouts(path: str, registry: SourceRegistry, default_printer: str) -> Dict[str, DigestLayout]:
+    """Read layouts from a YAML file."""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    layouts = parse_layouts(config, registry, default_printer)
+    _LOGGER.info(f"Loaded digests {', '.join(layouts)} from {path}")
+    return layouts
+
+
+def build_digests(
+    layouts: List[DigestLayout],
+    new_receipt: Callable[[], Any],
+    deadline: float = DEFAULT_DEADLINE,
+    metrics: Optional[Metrics] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """Fetch what all layouts need in one go and render each into its own receipt.
+
+    Sections with the same source and fetch parameters are fetched once,
+    however many layouts use them; with ``refresh`` they are fetched
+    again even if their source still has them cached. Returns the cut
+    receipts by layout name.
+    """
+    shared: Dict[str, Section] = {}
+    for layout in layouts:
+        for section in layout.sections:
+            if section.key not in shared:
+                shared[section.key] = Section(
+                    section.key, partial(section.source.fetch, section.fetch_params, refresh=refresh), section.source.render,
+                    timeout=section.source.timeout,
+                )
+    results = fetch_sections(list(shared.values()), deadline=deadline, metrics=metrics)
+
+    receipts = {}
+    for layout in layouts:
+        receipt = new_receipt()
+        sections = [
+            Section(
+                section.key,
+                shared[section.key].fetch,
+                partial(section.source.render, **section.render_params),
+                fallback=section.fallback,
+            )
+            for section in layout.sections
+        ]
+        render_sections(receipt, sections, results, metrics=metrics)
+        # Only appends to the buffer, the time it takes the printer shows up in its send stage
+        receipt.cut()
+        receipts[layout.name] = receipt
+    return receipts
@@ -0,0 +1,188 @@
+"""Streaming RSS/Atom reader that stops once it has enough entries."""
+import json
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import feedparser
+import requests
+
+from http_cache import HttpCache
+from layout import strip_html
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10
+CHUNK_SIZE = 4096
+
+_ITEM_TAGS = ("item", "entry")
+# Preferred first: RSS description, Atom summary, then full content
+_DESCRIPTION_TAGS = ("description", "summary", "content", "encoded")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _entry(item: ET.Element) -> Dict[str, str]:
+    fields: Dict[str, str] = {}
+    for child in item:
+        name = _local(child.tag)
+        if name == "title" or name in _DESCRIPTION_TAGS:
+            fields.setdefault(name, "".join(child.itertext()))
+
+    description = next((fields[name] for name in _DESCRIPTION_TAGS if name in fields), "")
+    return {
+        "title": strip_html(fields.get("title", "")),
+        "description": strip_html(description),
+    }
+
+
+def parse_entries(chunks: Iterable[bytes], count: int) -> Iterator[Dict[str, str]]:
+    """Yield up to ``count`` entries while feeding ``chunks`` to a pull parser.
+
+    Nothing past the last wanted entry is parsed; the caller stops reading
+    as soon as this generator is exhausted.
+    """
+    if count <= 0:
+        return
+    parser = ET.XMLPullParser(events=("start", "end"))
+    depth = 0
+    produced = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if _local(element.tag) not in _ITEM_TAGS:
+                continue
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth:
+                continue
+            yield _entry(element)
+            element.clear()
+            produced += 1
+            if produced >= count:
+                return
+
+
+class FeedReader:
+    """Reads the first entries of RSS/Atom feeds without downloading them whole.
+
+    The response body is parsed as it arrives and the connection is closed
+    once ``count`` entries have been produced. Results are remembered per
+    feed for ``ttl`` seconds and revalidated with the feed's ETag or
+    Last-Modified afterwards, so an unchanged feed costs a 304. With a
+    ``cache`` the parsed entries and validators are also kept on disk, so
+    they survive a restart. Feeds that are not well-formed XML fall back
+    to feedparser on the whole document.
+    """
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache: Optional[HttpCache] = None,
+    ):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.cache = cache
+        self._memo: Dict[Tuple[str, int], Dict] = {}
+        self._lock = threading.Lock()
+
+    def entries(self, url: str, count: int, ttl: float = 0, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """Return the first ``count`` entries of the feed at ``url``."""
+        key = (url, count)
+        memo = self._load(key)
+        if memo and time.time() - memo["fetched_at"] < ttl:
+            return memo["entries"]
+
+        headers = {}
+        if memo and memo.get("etag"):
+            headers["If-None-Match"] = memo["etag"]
+        if memo and memo.get("last_modified"):
+            headers["If-Modified-Since"] = memo["last_modified"]
+
+        with self.session.get(url, headers=headers, stream=True, timeout=timeout or self.timeout) as response:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if response.status_code == 304 and memo:
+                entries = memo["entries"]
+                # A 304 needn't repeat the validators, keep the ones we have
+                etag = etag or memo.get("etag")
+                last_modified = last_modified or memo.get("last_modified")
+            else:
+                response.raise_for_status()
+                entries = self._read(response, count)
+
+        self._save(key, {"entries": entries, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()})
+        return entries
+
+    @staticmethod
+    def _cache_key(key: Tuple[str, int]) -> str:
+        return f"feed {key[1]} {key[0]}"
+
+    def _load(self, key: Tuple[str, int]) -> Optional[Dict]:
+        with self._lock:
+            memo = self._memo.get(key)
+        if memo or not self.cache:
+            return memo
+
+        stored = self.cache.load(self._cache_key(key))
+        if stored is None:
+            return None
+        headers, body, fetched_at = stored
+        memo = {
+            "entries": json.loads(body),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": fetched_at,
+        }
+        with self._lock:
+            self._memo.setdefault(key, memo)
+        return memo
+
+    def _save(self, key: Tuple[str, int], memo: Dict) -> None:
+        with self._lock:
+            self._memo[key] = memo
+        if not self.cache:
+            return
+        headers = {"ETag": memo["etag"], "Last-Modified": memo["last_modified"]}
+        try:
+            self.cache.save(
+                self._cache_key(key),
+                key[0],
+                {name: value for name, value in headers.items() if value},
+                json.dumps(memo["entries"]).encode(),
+                memo["fetched_at"],
+            )
+        except Exception as e:
+            _LOGGER.warning(f"Could not cache feed {key[0]}: {e}")
+
+    @staticmethod
+    def _read(response: requests.Response, count: int) -> List[Dict[str, str]]:
+        received: List[bytes] = []
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                received.append(chunk)
+                yield chunk
+
+        stream = chunks()
+        try:
+            entries = list(parse_entries(stream, count))
+            _LOGGER.debug(f"Read {sum(map(len, received))} bytes of {response.url} for {len(entries)} entries")
+            return entries
+        except ET.ParseError as e:
+            _LOGGER.info(f"Feed {response.url} is not well-formed ({e}), parsing it with feedparser")
+            # Read whatever the parser did not get to
+            for _ in stream:
+                pass
+            feed = feedparser.parse(b"".join(received))
+            return [
+                {"title": strip_html(entry.get("title", "")), "description": strip_html(entry.get("description", ""))}
+                for entry in feed.entries[:count]
+            ]
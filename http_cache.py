@@ -0,0 +1,161 @@
+"""Persistent conditional-GET cache for the digest's upstream HTTP calls."""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = ".http_cache.sqlite"
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_TIMEOUT = 10
+
+# Response headers worth keeping, e.g. Link for Basecamp pagination
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+class HttpCache:
+    """On-disk HTTP cache with ETag/Last-Modified revalidation and LRU eviction.
+
+    A cached response younger than the caller's ``ttl`` is served without
+    touching the network. Older entries are revalidated with
+    ``If-None-Match``/``If-Modified-Since`` and a 304 is answered from disk.
+    The store is trimmed least-recently-used first to stay under
+    ``max_bytes``.
+
+    ``load`` and ``save`` keep data derived from a response, e.g. parsed
+    feed entries, under a key of the caller's choosing with the headers
+    needed to revalidate it.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _key(url: str, headers: Dict[str, str]) -> str:
+        # Authenticated responses differ per token, so the token is part of the key
+        auth = headers.get("Authorization", "")
+        return hashlib.sha1(f"{url}\n{auth}".encode()).hexdigest()
+
+    def get(
+        self,
+        url: str,
+        ttl: float = 0,
+        headers: Optional[Dict[str, str]] = None,
+        session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> requests.Response:
+        """GET a URL through the cache.
+
+        Returns a ``requests.Response``; ``from_cache`` is True when the body
+        came from disk.
+        """
+        headers = dict(headers or {})
+        session = session or self._session
+        request_headers = dict(session.headers, **headers)
+        key = self._key(url, request_headers)
+
+        row = self.load(key)
+        if row:
+            stored_headers, body, fetched_at = row
+            if time.time() - fetched_at < ttl:
+                self._touch(key)
+                return self._response(url, stored_headers, body)
+
+            if "ETag" in stored_headers:
+                headers["If-None-Match"] = stored_headers["ETag"]
+            if "Last-Modified" in stored_headers:
+                headers["If-Modified-Since"] = stored_headers["Last-Modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and row:
+            _LOGGER.debug(f"Revalidated {url}")
+            self._touch(key, revalidated=True)
+            return self._response(url, stored_headers, body)
+
+        response.from_cache = False
+        if response.status_code == 200 and (ttl > 0 or "ETag" in response.headers or "Last-Modified" in response.headers):
+            self._store(key, url, response)
+        return response
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, str], bytes, float]]:
+        """Return the stored headers, body and fetch time of an entry."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT headers, body, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), bytes(row[1]), row[2]
+
+    def save(self, key: str, url: str, headers: Dict[str, str], body: bytes, fetched_at: Optional[float] = None) -> None:
+        """Store an entry, replacing what was stored under its key."""
+        if len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, url, headers, body, size, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(headers), sqlite3.Binary(body), len(body), fetched_at or now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _response(self, url: str, headers: Dict[str, str], body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = bytes(body)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+    def _touch(self, key: str, revalidated: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE entries SET accessed_at = ?, fetched_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+    def _store(self, key: str, url: str, response: requests.Response) -> None:
+        stored_headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+        self.save(key, url, stored_headers, response.content)
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the store fits. Caller holds the lock."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
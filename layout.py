@@ -0,0 +1,155 @@
+"""Paper-width-aware text layout for receipts."""
+import html
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from escpos.capabilities import get_profile
+
+try:
+    import pyphen
+except ImportError:
+    pyphen = None
+
+DEFAULT_CACHE_SIZE = 1024
+
+# How many columns one character takes up in each size mode
+_WIDTH_FACTOR = {"normal": 1, "2w": 2, "2h": 1, "2x": 2}
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLOCK_RE = re.compile(r"<\s*(br|/p|/div|/li)\b[^>]*>", re.IGNORECASE)
+_SCRIPT_RE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+SOFT_HYPHEN = "\xad"
+DEFAULT_LANGUAGE = "de_DE"
+MIN_FRAGMENT = 3
+
+
+def strip_html(text: str) -> str:
+    """Turn an HTML fragment into plain text, keeping paragraph breaks."""
+    text = _SCRIPT_RE.sub("", text)
+    text = _BLOCK_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub("", text))
+    lines = [_SPACE_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+@lru_cache(maxsize=None)
+def _dictionary(language: Optional[str]):
+    """Return the pyphen dictionary for ``language``, None without one."""
+    if pyphen is None or not language:
+        return None
+    return pyphen.Pyphen(lang=language, left=MIN_FRAGMENT, right=MIN_FRAGMENT)
+
+
+@lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def _break_points(word: str, language: Optional[str] = DEFAULT_LANGUAGE) -> Tuple[str, Tuple[int, ...]]:
+    """Return ``word`` without soft hyphens and the offsets it may be split at.
+
+    Hyphens are always break points. Soft hyphens mark where the author
+    allows a break, if there are any the word breaks only there; otherwise
+    each run of letters is hyphenated with the pyphen dictionary for
+    ``language``. Without pyphen words break only at (soft) hyphens, a
+    guessed syllable break reads worse than none.
+    """
+    points = set()
+    plain = ""
+    for char in word:
+        if char == SOFT_HYPHEN:
+            points.add(len(plain))
+        else:
+            plain += char
+            if char == "-":
+                points.add(len(plain))
+
+    dictionary = _dictionary(language)
+    if dictionary is not None and SOFT_HYPHEN not in word:
+        for letters in _LETTERS_RE.finditer(plain):
+            points.update(letters.start() + point for point in dictionary.positions(letters.group()))
+    return plain, tuple(sorted(point for point in points if 0 < point < len(plain)))
+
+
+def _split(word: str, points: Tuple[int, ...], space: int) -> int:
+    """Return the last break point whose head, with its hyphen, fits in ``space``, or 0."""
+    for point in reversed(points):
+        explicit = word[point - 1] == "-"
+        if point + (0 if explicit else 1) <= space:
+            return point
+    return 0
+
+
+def _fill_paragraph(paragraph: str, width: int, language: Optional[str]) -> List[str]:
+    lines: List[str] = []
+    line = ""
+    for word in paragraph.split():
+        word, points = _break_points(word, language)
+        while word:
+            space = width - len(line) - (1 if line else 0)
+            if len(word) <= space:
+                line = f"{line} {word}" if line else word
+                word = ""
+                continue
+
+            point = _split(word, points, space) if space > MIN_FRAGMENT else 0
+            if point:
+                head = word[:point] + ("" if word[point - 1] == "-" else "-")
+                line = f"{line} {head}" if line else head
+            elif not line:
+                # Longer than a whole line and no break fits: cut it
+                point = width - 1
+                line = word[:point] + "-"
+            if point:
+                word = word[point:]
+                points = tuple(p - point for p in points if p > point)
+            lines.append(line)
+            line = ""
+    if line:
+        lines.append(line)
+    return lines
+
+
+@lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def layout_text(text: str, width: int, html: bool = False, language: Optional[str] = DEFAULT_LANGUAGE) -> str:
+    """Wrap and hyphenate ``text`` to ``width`` columns, keeping line breaks.
+
+    Results are cached by text, width, language and whether HTML is stripped; font
+    and size only matter through the width they leave, so modes with the
+    same width share entries.
+    """
+    if html:
+        text = strip_html(text)
+    width = max(width, MIN_FRAGMENT + 1)
+    lines: List[str] = []
+    for paragraph in text.split("\n"):
+        lines.extend(_fill_paragraph(paragraph, width, language) or [""])
+    return "\n".join(lines)
+
+
+class Layout:
+    """Knows how many characters fit on a line for each font and size.
+
+    Columns per font come from the python-escpos printer profile, any of
+    them can be overridden with ``columns``, e.g. ``{"a": 48}`` for an
+    80mm printer whose profile doesn't say. ``language`` picks the pyphen
+    hyphenation dictionary, None breaks words only at hyphens.
+    """
+
+    def __init__(self, profile: Optional[str] = None, columns: Optional[Dict[str, int]] = None,
+                 language: Optional[str] = DEFAULT_LANGUAGE):
+        self.profile = get_profile(profile)
+        self.overrides = columns or {}
+        self.language = language
+
+    def columns(self, font: str = "a", size: str = "normal") -> int:
+        """Return the characters per line for a font and size mode."""
+        if font in self.overrides:
+            base = self.overrides[font]
+        else:
+            base = self.profile.get_columns(font)
+        return base // _WIDTH_FACTOR[size]
+
+    def fill(self, text: str, font: str = "a", size: str = "normal", html: bool = False) -> str:
+        """Lay out ``text`` for a font and size mode."""
+        return layout_text(text, self.columns(font, size), html, self.language)
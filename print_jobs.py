@@ -0,0 +1,248 @@
+"""Background print queue for the HTTP front end."""
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from breaker import STATE_CLOSED, CircuitBreaker, CircuitOpenError
+from metrics import Metrics
+from spool import Spool
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HISTORY = 200
+DEFAULT_RETRIES = 4
+DEFAULT_RETRY_DELAY = 5
+MAX_RETRY_DELAY = 120
+
+STATUS_QUEUED = "queued"
+STATUS_PRINTING = "printing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class PrintJob:
+    """Compiled ESC/POS bytes for one printer and what became of them."""
+
+    def __init__(self, kind: str, printer: str, data: Optional[bytes], job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.printer = printer
+        self.data = data
+        self.status = STATUS_QUEUED
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.failed_over_from: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+
+    @classmethod
+    def from_spool(cls, row: Dict) -> "PrintJob":
+        """Rebuild a job from its spool record."""
+        job = cls(row["kind"], row["printer"], row.get("data"), job_id=row["job_id"])
+        job.status = row["status"]
+        job.error = row["error"]
+        job.created = row["created"]
+        job.finished = row["finished"]
+        if job.finished is not None:
+            job._done.set()
+        return job
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished, return False on timeout."""
+        return self._done.wait(timeout)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the job as a JSON-serialisable dict."""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "printer": self.printer,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class PrintQueue:
+    """Sends print jobs one at a time from a worker thread.
+
+    The printer only handles one connection at a time, so every send goes
+    through this queue. HTTP handlers submit a job and either return its id
+    straight away or wait on it, and a slow digest no longer holds up the
+    request threads of other callers. Jobs are kept for status lookups,
+    the oldest finished ones are forgotten beyond ``history``.
+
+    With a ``spool``, every job is written to disk before it is queued and
+    jobs that were not confirmed printed are sent again on start. A job id
+    that was submitted before returns the existing job instead of printing
+    twice.
+
+    Every printer has a circuit breaker, so while it is known to be down
+    jobs fail straight away instead of each waiting for a connect timeout.
+    Failed jobs are tried again after ``retry_delay`` seconds, doubling up
+    to ``MAX_RETRY_DELAY`` and never before the circuit lets a call
+    through again, at most ``retries`` times; a job the open circuit turns
+    away is not counted as an attempt. Later jobs wait while a job is
+    retried, so they can't print before it. Once a printer's circuit is
+    open, its jobs move to the printer's entry in ``backups`` if it has
+    one, in the spool too.
+
+    With ``metrics``, jobs and bytes sent are counted per printer and
+    outcome, as are failed attempts, retries and failovers.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, bytes], None],
+        spool: Optional[Spool] = None,
+        history: int = DEFAULT_HISTORY,
+        retries: int = DEFAULT_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        backups: Optional[Dict[str, str]] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.send = send
+        self.spool = spool
+        self.history = history
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.backups = backups or {}
+        self.metrics = metrics or Metrics()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._jobs: "OrderedDict[str, PrintJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[PrintJob]" = queue.Queue()
+
+        if spool:
+            for row in spool.pending():
+                job = PrintJob.from_spool(row)
+                job.status = STATUS_QUEUED
+                self._remember(job)
+                self._queue.put(job)
+            if self._queue.qsize():
+                _LOGGER.info(f"Replaying {self._queue.qsize()} spooled print jobs")
+
+        self._worker = threading.Thread(target=self._run, name="print-queue", daemon=True)
+        self._worker.start()
+
+    def submit(self, kind: str, printer: str, data: bytes, job_id: Optional[str] = None) -> PrintJob:
+        """Queue compiled bytes for ``printer`` and return the job."""
+        if job_id:
+            existing = self.get(job_id)
+            if existing is not None:
+                return existing
+
+        job = PrintJob(kind, printer, data, job_id=job_id)
+        if self.spool and not self.spool.add(job.job_id, printer, data, kind):
+            # Spooled by a concurrent submit with the same id
+            return self.get(job.job_id)
+        self._remember(job)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[PrintJob]:
+        """Return a job by id, if it is still known."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.spool:
+            row = self.spool.get(job_id)
+            if row:
+                job = PrintJob.from_spool(row)
+        return job
+
+    def depth(self) -> int:
+        """Return the number of jobs waiting to be printed."""
+        return self._queue.qsize()
+
+    def breaker(self, printer: str) -> CircuitBreaker:
+        """Return the circuit breaker of a printer."""
+        with self._lock:
+            if printer not in self._breakers:
+                self._breakers[printer] = CircuitBreaker(f"Printer {printer}")
+            return self._breakers[printer]
+
+    def _remember(self, job: PrintJob) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # Forget the oldest finished jobs once the history is full
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.finished is None:
+                    break
+                self._jobs.popitem(last=False)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            # Later jobs wait while this one fails over or is retried, so they can't overtake it
+            while not self._send(job):
+                if not (self._failover(job) or self._retry(job)):
+                    _LOGGER.error(f"Print job {job.job_id} ({job.kind}) failed: {job.error}")
+                    job.status = STATUS_FAILED
+                    break
+            self.metrics.inc("jobs_total", printer=job.printer, status=job.status)
+            self._finish(job)
+
+    def _send(self, job: PrintJob) -> bool:
+        """Send a job once, return whether it printed."""
+        job.status = STATUS_PRINTING
+        job.attempts += 1
+        try:
+            self.breaker(job.printer).call(self.send, job.printer, job.data)
+        except Exception as e:
+            job.error = str(e)
+            if isinstance(e, CircuitOpenError):
+                # Turned away by the breaker without being sent, not an attempt
+                job.attempts -= 1
+            else:
+                self.metrics.inc("failures_total", printer=job.printer)
+            return False
+        job.status = STATUS_DONE
+        job.error = None
+        self.metrics.inc("bytes_total", len(job.data), printer=job.printer)
+        return True
+
+    def _failover(self, job: PrintJob) -> bool:
+        backup = self.backups.get(job.printer)
+        if not backup or job.failed_over_from or self.breaker(job.printer).state == STATE_CLOSED:
+            return False
+        _LOGGER.warning(f"Printer {job.printer} is down, sending job {job.job_id} to {backup}")
+        self.metrics.inc("failovers_total", printer=job.printer)
+        job.failed_over_from, job.printer = job.printer, backup
+        job.status = STATUS_QUEUED
+        if self.spool:
+            try:
+                self.spool.reassign(job.job_id, backup)
+            except Exception as e:
+                _LOGGER.error(f"Could not record the failover of print job {job.job_id} in the spool: {e}")
+        return True
+
+    def _retry(self, job: PrintJob) -> bool:
+        if job.attempts > self.retries:
+            return False
+        # Retrying before the circuit lets a call through again would only be turned away
+        delay = max(
+            min(self.retry_delay * 2 ** max(job.attempts - 1, 0), MAX_RETRY_DELAY), self.breaker(job.printer).retry_in
+        )
+        _LOGGER.info(f"Print job {job.job_id} failed ({job.error}), retrying in {delay:.0f}s")
+        self.metrics.inc("retries_total", printer=job.printer)
+        job.status = STATUS_QUEUED
+        time.sleep(delay)
+        return True
+
+    def _finish(self, job: PrintJob) -> None:
+        job.finished = time.time()
+        job.data = None
+        if self.spool:
+            try:
+                self.spool.mark([job.job_id], job.status, job.error)
+            except Exception as e:
+                _LOGGER.error(f"Could not record print job {job.job_id} in the spool: {e}")
+        job._done.set()
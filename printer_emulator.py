@@ -0,0 +1,396 @@
+"""Local ESC/POS network printer emulator.
+
+Listens like a printer on port 9100, parses the command stream into
+receipts and answers real-time status queries. It can simulate a slow
+link, paper out, an open cover and dropped connections, so printing can be
+tested and benchmarked without the real device.
+
+    python printer_emulator.py --port 9100 --bandwidth 20000 --output receipts/
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from text_encoding import DEFAULT_CODEPAGES
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9100
+CHUNK_SIZE = 1024
+
+ESC, GS, DLE, FS = 0x1B, 0x1D, 0x10, 0x1C
+
+# Parameter bytes that follow fixed-length commands
+_ESC_PARAMS = {
+    b"@": 0, b"!": 1, b"E": 1, b"-": 1, b"a": 1, b"t": 1, b"M": 1, b"G": 1, b"{": 1, b"d": 1, b"J": 1,
+    b"V": 1, b"r": 1, b"2": 0, b"3": 1, b"R": 1, b"p": 3, b"i": 0, b"m": 0, b"U": 1, b"e": 1, b" ": 1,
+    b"%": 1, b"$": 2, b"\\": 2, b"T": 1, b"W": 8, b"c": 2, b"=": 1, b"L": 0, b"S": 0,
+}
+_GS_PARAMS = {
+    b"!": 1, b"B": 1, b"h": 1, b"w": 1, b"H": 1, b"f": 1, b"L": 2, b"W": 2, b"b": 1, b"r": 1, b"a": 1,
+    b"I": 1, b"P": 2, b"x": 1, b"y": 1, b"X": 1,
+}
+_CODECS = {number: name.lower() for name, number in DEFAULT_CODEPAGES.items()}
+
+
+class Receipt:
+    """What one cut's worth of the command stream printed."""
+
+    def __init__(self):
+        self.text: List[str] = []
+        self.qr_codes: List[str] = []
+        self.images = 0
+        self.codepage_switches = 0
+        self.bytes = 0
+        self.printed = True
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def content(self) -> str:
+        return "".join(self.text)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.content.strip() or self.qr_codes or self.images)
+
+
+class _Parser:
+    """Incremental ESC/POS parser for one connection."""
+
+    def __init__(self, emulator: "PrinterEmulator"):
+        self.emulator = emulator
+        self.buffer = bytearray()
+        self.codec = _CODECS[0]
+        self.receipt = Receipt()
+
+    def feed(self, data: bytes) -> bytes:
+        """Consume data and return the bytes to answer with."""
+        self.buffer += data
+        replies = bytearray()
+        pos = 0
+        while pos < len(self.buffer):
+            receipt = self.receipt
+            consumed = self._command(pos, replies)
+            if consumed is None:
+                break
+            receipt.bytes += consumed
+            pos += consumed
+        del self.buffer[:pos]
+        return bytes(replies)
+
+    def close(self) -> None:
+        if not self.receipt.empty:
+            self.emulator.record(self.receipt)
+
+    def _text(self, pos: int) -> int:
+        end = pos
+        while end < len(self.buffer) and (self.buffer[end] >= 0x20 or self.buffer[end] in (0x0A, 0x09)):
+            end += 1
+        self.receipt.text.append(bytes(self.buffer[pos:end]).decode(self.codec, errors="replace"))
+        return end - pos
+
+    def _command(self, pos: int, replies: bytearray) -> Optional[int]:
+        """Handle the command at ``pos``, return its length or None if incomplete."""
+        buf = self.buffer
+        first = buf[pos]
+        if first not in (ESC, GS, DLE, FS):
+            return self._text(pos) or 1
+        if pos + 1 >= len(buf):
+            return None
+        code = bytes(buf[pos + 1:pos + 2])
+        available = len(buf) - pos
+
+        if first == DLE:
+            if code == b"\x04":
+                if available < 3:
+                    return None
+                replies.append(self.emulator.status_byte(buf[pos + 2]))
+                return 3
+            if code == b"\x14":
+                return 5 if available >= 5 else None
+            return 3 if available >= 3 else None
+
+        if first == FS:
+            size = 3 if code == b"C" else 2
+            return size if available >= size else None
+
+        if first == ESC:
+            if code == b"t" and available >= 3:
+                self.codec = _CODECS.get(buf[pos + 2], self.codec)
+                self.receipt.codepage_switches += 1
+            if code == b"D":
+                end = buf.find(b"\x00", pos + 2)
+                return None if end < 0 else end - pos + 1
+            if code == b"*":
+                if available < 5:
+                    return None
+                mode, length = buf[pos + 2], buf[pos + 3] + buf[pos + 4] * 256
+                size = 5 + length * (3 if mode >= 32 else 1)
+                return size if available >= size else None
+            size = 2 + _ESC_PARAMS.get(code, 0)
+            return size if available >= size else None
+
+        # GS
+        if code == b"V":
+            if available < 3:
+                return None
+            size = 4 if buf[pos + 2] in (65, 66, 97, 98, 103, 104) else 3
+            if available < size:
+                return None
+            self._cut()
+            return size
+        if code in (b"(", b"8"):
+            header = 5 if code == b"(" else 7
+            if available < header:
+                return None
+            if code == b"(":
+                length = buf[pos + 3] + buf[pos + 4] * 256
+            else:
+                length = int.from_bytes(buf[pos + 3:pos + 7], "little")
+            size = header + length
+            if available < size:
+                return None
+            function = buf[pos + header + 1] if length > 1 else None
+            if code == b"(" and buf[pos + 2] == ord("k") and function == 80:
+                # Store QR code data: cn 49, fn 80, m 48, then the payload
+                self.receipt.qr_codes.append(bytes(buf[pos + 8:pos + size]).decode("utf-8", errors="replace"))
+            elif buf[pos + 2] == ord("L") and function == 112:
+                # Store graphics data; printing it is a separate command
+                self.receipt.images += 1
+            return size
+        if code == b"v":
+            if available < 8:
+                return None
+            width = buf[pos + 4] + buf[pos + 5] * 256
+            height = buf[pos + 6] + buf[pos + 7] * 256
+            size = 8 + width * height
+            if available < size:
+                return None
+            self.receipt.images += 1
+            return size
+        if code == b"k":
+            if available < 3:
+                return None
+            kind = buf[pos + 2]
+            if kind <= 6:
+                end = buf.find(b"\x00", pos + 3)
+                return None if end < 0 else end - pos + 1
+            if available < 4:
+                return None
+            size = 4 + buf[pos + 3]
+            return size if available >= size else None
+        size = 2 + _GS_PARAMS.get(code, 0)
+        return size if available >= size else None
+
+    def _cut(self) -> None:
+        self.emulator.record(self.receipt)
+        self.receipt = Receipt()
+
+
+class PrinterEmulator:
+    """A TCP server that behaves like an ESC/POS network printer.
+
+    ``bandwidth`` throttles how fast data is read in bytes per second,
+    ``drop_rate`` is the chance that a connection is cut part way through
+    and ``drop_after`` cuts every connection after that many bytes. While
+    ``paper_out`` is set, status queries report it and receipts are
+    recorded as not printed.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        bandwidth: Optional[float] = None,
+        paper_out: bool = False,
+        cover_open: bool = False,
+        drop_rate: float = 0.0,
+        drop_after: Optional[int] = None,
+        output_dir: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.bandwidth = bandwidth
+        self.paper_out = paper_out
+        self.cover_open = cover_open
+        self.drop_rate = drop_rate
+        self.drop_after = drop_after
+        self.output_dir = output_dir
+        self.receipts: List[Receipt] = []
+        self.bytes_received = 0
+        self.connections = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._recorded = threading.Condition(self._lock)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def status_byte(self, query: int) -> int:
+        """Answer a DLE EOT status query."""
+        status = 0x12
+        if query == 1 and (self.paper_out or self.cover_open):
+            status |= 0x08
+        elif query == 2:
+            status |= (0x20 if self.paper_out else 0) | (0x04 if self.cover_open else 0)
+        elif query == 4 and self.paper_out:
+            status |= 0x60
+        return status
+
+    def record(self, receipt: Receipt) -> None:
+        """Store a finished receipt."""
+        receipt.finished = time.monotonic()
+        receipt.printed = not (self.paper_out or self.cover_open)
+        with self._recorded:
+            self.receipts.append(receipt)
+            number = len(self.receipts)
+            self._recorded.notify_all()
+        if self.output_dir:
+            with open(os.path.join(self.output_dir, f"receipt-{number:05d}.txt"), "w") as f:
+                f.write(receipt.content)
+        _LOGGER.debug(f"Receipt {number}: {receipt.bytes} bytes, {len(receipt.content)} characters")
+
+    def reset(self) -> None:
+        """Forget recorded receipts and counters."""
+        with self._lock:
+            self.receipts = []
+            self.bytes_received = self.connections = self.dropped = 0
+
+    def wait_for(self, receipts: int, timeout: Optional[float] = None) -> bool:
+        """Block until ``receipts`` receipts have been recorded in all, return False on timeout."""
+        with self._recorded:
+            return self._recorded.wait_for(lambda: len(self.receipts) >= receipts, timeout)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        parser = _Parser(self)
+        limit = self.drop_after
+        if limit is None and self.drop_rate and random.random() < self.drop_rate:
+            limit = random.randint(1, 4096)
+        received = 0
+        try:
+            while True:
+                data = await reader.read(CHUNK_SIZE)
+                if not data:
+                    break
+                if limit is not None and received + len(data) > limit:
+                    data = data[:limit - received]
+                    parser.feed(data)
+                    self.bytes_received += len(data)
+                    self.dropped += 1
+                    _LOGGER.info(f"Dropping connection after {limit} bytes")
+                    return
+                received += len(data)
+                self.bytes_received += len(data)
+                reply = parser.feed(data)
+                if reply:
+                    writer.write(reply)
+                    await writer.drain()
+                if self.bandwidth:
+                    await asyncio.sleep(len(data) / self.bandwidth)
+        except ConnectionError:
+            pass
+        finally:
+            parser.close()
+            writer.close()
+
+    async def async_start(self) -> Tuple[str, int]:
+        """Start listening, return the address actually bound."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def async_stop(self) -> None:
+        """Stop listening."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start(self) -> Tuple[str, int]:
+        """Run the emulator on its own event loop in a background thread."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.async_start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="printer-emulator", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        """Stop an emulator started with ``start``."""
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.async_stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def stats(self) -> Dict:
+        """Return counters for reporting."""
+        with self._lock:
+            receipts = list(self.receipts)
+        return {
+            "receipts": len(receipts),
+            "printed": sum(1 for receipt in receipts if receipt.printed),
+            "bytes": self.bytes_received,
+            "connections": self.connections,
+            "dropped": self.dropped,
+            "codepage_switches": sum(receipt.codepage_switches for receipt in receipts),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bandwidth", type=float, help="Bytes per second the printer reads")
+    parser.add_argument("--paper-out", action="store_true", help="Report paper out and print nothing")
+    parser.add_argument("--cover-open", action="store_true", help="Report an open cover and print nothing")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Chance of cutting a connection part way through")
+    parser.add_argument("--drop-after", type=int, help="Cut every connection after this many bytes")
+    parser.add_argument("--output", help="Directory to write received receipts to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    emulator = PrinterEmulator(
+        args.host, args.port, args.bandwidth, args.paper_out, args.cover_open,
+        args.drop_rate, args.drop_after, args.output,
+    )
+
+    async def serve() -> None:
+        host, port = await emulator.async_start()
+        _LOGGER.info(f"Emulating an ESC/POS printer on {host}:{port}")
+        await asyncio.Event().wait()
+
+    original_record = emulator.record
+
+    def record(receipt: Receipt) -> None:
+        original_record(receipt)
+        print(f"\n----- receipt {len(emulator.receipts)} ({receipt.bytes} bytes) -----")
+        print(receipt.content.rstrip())
+        for qr in receipt.qr_codes:
+            print(f"[QR {qr}]")
+        print(f"----- {'cut' if receipt.printed else 'NOT PRINTED'} -----")
+
+    emulator.record = record
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Content-addressed cache of rendered ESC/POS QR codes and images."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from escpos.printer import Dummy
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".raster_cache"
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _render(profile: Optional[str], draw: Callable[[Dummy], None]) -> bytes:
+    printer = Dummy(profile=profile)
+    draw(printer)
+    return printer.output
+
+
+class RasterCache:
+    """Two-tier cache of the bytes python-escpos emits for QR codes and images.
+
+    Rendering a QR code means encoding it, drawing it with PIL and
+    rasterising it for the printer, which is slow on small ARM boards. The
+    result only depends on the payload, the options and the printer
+    profile, so it is stored under a hash of those. Lookups hit an
+    in-memory LRU first, then files on disk, which are trimmed least
+    recently used first to stay under ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_DIR,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _key(kind: str, payload: bytes, profile: Optional[str], options: dict) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps([kind, profile or "default", options], sort_keys=True, default=str).encode())
+        digest.update(payload)
+        return digest.hexdigest()
+
+    def qr(self, content: str, profile: Optional[str] = None, **kwargs) -> bytes:
+        """Return the ESC/POS bytes for a QR code."""
+        key = self._key("qr", content.encode(), profile, kwargs)
+        return self._get(key, lambda: _render(profile, lambda printer: printer.qr(content, **kwargs)))
+
+    def image(self, path: str, profile: Optional[str] = None, **kwargs) -> bytes:
+        """Return the ESC/POS bytes for an image file."""
+        with open(path, "rb") as f:
+            payload = f.read()
+        key = self._key("image", payload, profile, kwargs)
+        return self._get(key, lambda: _render(profile, lambda printer: printer.image(path, **kwargs)))
+
+    def _get(self, key: str, render: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        data = self._read(key)
+        if data is None:
+            data = render()
+            self._write(key, data)
+
+        with self._lock:
+            self._memory[key] = data
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return data
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.bin")
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Mark as recently used for disk eviction
+            os.utime(self._file(key))
+        except OSError:
+            pass
+        return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+            self._evict()
+        except OSError as e:
+            _LOGGER.warning(f"Could not store raster in {self.path}: {e}")
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(".bin"):
+                stat = os.stat(os.path.join(self.path, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.path, name))
+            total -= size
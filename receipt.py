@@ -0,0 +1,124 @@
+"""In-memory ESC/POS receipt compiler."""
+from typing import Dict, Optional
+
+from escpos.printer import Dummy
+
+from raster_cache import RasterCache
+from text_encoding import CodepageEncoder
+
+# set() arguments tracked individually; text size is tracked as one value
+_TRACKED = ("align", "font", "bold", "underline", "invert", "flip", "smooth", "density")
+# A size change is sent as ESC !, which also turns these off on the printer
+_RESET_BY_SIZE = ("bold", "underline", "font")
+
+
+def _size(style: Dict) -> Optional[str]:
+    """Collapse python-escpos' size flags into one of normal, 2w, 2h, 2x."""
+    if style.get("normal_textsize"):
+        return "normal"
+    if style.get("double_width") is None and style.get("double_height") is None:
+        return None
+    width, height = bool(style.get("double_width")), bool(style.get("double_height"))
+    if width and height:
+        return "2x"
+    if width:
+        return "2w"
+    if height:
+        return "2h"
+    return "normal"
+
+
+_SIZE_ARGS = {
+    "normal": {"normal_textsize": True},
+    "2w": {"double_width": True},
+    "2h": {"double_height": True},
+    "2x": {"double_width": True, "double_height": True},
+}
+
+
+class Receipt:
+    """Compiles a whole receipt into one ESC/POS byte buffer.
+
+    It offers the printer methods the render functions use (``set``,
+    ``text``, ``qr``, ``cut``), so they can render into it unchanged.
+    ``set`` only emits the style attributes that actually change, text is
+    encoded a whole string at a time by an optional ``CodepageEncoder``,
+    and ``send`` transmits the finished buffer with a single write. The
+    compiled bytes stay available in ``output`` for reprints or for
+    sending the same receipt to several printers.
+    """
+
+    def __init__(
+        self,
+        profile: Optional[str] = None,
+        raster_cache: Optional[RasterCache] = None,
+        encoder: Optional[CodepageEncoder] = None,
+    ):
+        self.profile = profile
+        self.raster_cache = raster_cache
+        self.encoder = encoder
+        self._printer = Dummy(profile=profile)
+        self._style: Dict = {}
+        self._codepage: Optional[int] = None
+
+    def set(self, **style) -> None:
+        """Change text style, skipping attributes that are already in effect."""
+        changes = {}
+        for key in _TRACKED:
+            if style.get(key) is not None and self._style.get(key) != style[key]:
+                changes[key] = style[key]
+
+        size = _size(style)
+        if size is not None and self._style.get("size") != size:
+            changes.update(_SIZE_ARGS[size])
+            self._style["size"] = size
+            # python-escpos sends the size first, so these go out again after it
+            for key in _RESET_BY_SIZE:
+                self._style.pop(key, None)
+                if style.get(key) is not None:
+                    changes[key] = style[key]
+
+        if changes:
+            self._style.update({key: value for key, value in changes.items() if key in _TRACKED})
+            self._printer.set(**changes)
+
+    def text(self, txt: str) -> None:
+        """Append text."""
+        if self.encoder:
+            data, self._codepage = self.encoder.encode(txt, self._codepage)
+            self._printer._raw(data)
+        else:
+            self._printer.text(txt)
+
+    def qr(self, content: str, **kwargs) -> None:
+        """Append a QR code, rendered once per payload if a raster cache is set."""
+        if self.raster_cache:
+            self._printer._raw(self.raster_cache.qr(content, self.profile, **kwargs))
+        else:
+            self._printer.qr(content, **kwargs)
+        if kwargs.get("center"):
+            # qr() centers on its own, so the tracked alignment is no longer known
+            self._style.pop("align", None)
+        # python-escpos selects a codepage of its own while rendering it
+        self._codepage = None
+
+    def image(self, path: str, **kwargs) -> None:
+        """Append an image file."""
+        if self.raster_cache:
+            self._printer._raw(self.raster_cache.image(path, self.profile, **kwargs))
+        else:
+            self._printer.image(path, **kwargs)
+        self._codepage = None
+
+    def cut(self, **kwargs) -> None:
+        """Append a paper cut."""
+        self._printer.cut(**kwargs)
+
+    @property
+    def output(self) -> bytes:
+        """Return the compiled ESC/POS bytes."""
+        return self._printer.output
+
+    def send(self, printer) -> None:
+        """Transmit the compiled receipt to a python-escpos printer in one write."""
+        printer._raw(self.output)
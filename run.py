@@ -1,4 +1,3 @@
-import feedparser
 from escpos.printer import Network
 import textwrap
 import requests
@@ -6,35 +5,153 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv, dotenv_values 
 from pprint import pprint
-from flask import Flask, redirect, request, session, url_for, jsonify
+from flask import Flask, Response, redirect, request, session, url_for, jsonify
 load_dotenv()
 import json
 from datetime import date
 import random
-from ticktick.oauth2 import OAuth2        # OAuth2 Manager
-from ticktick.api import TickTickClient   # Main Interface
 import datetime
+from functools import partial
+from basecamp import BasecampClient, DEFAULT_MAX_WORKERS
+from http_cache import HttpCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from receipt import Receipt
+from raster_cache import RasterCache, DEFAULT_CACHE_DIR as DEFAULT_RASTER_CACHE_DIR
+from digest import DEFAULT_SECTION_TIMEOUT, DEFAULT_DEADLINE
+from digest_layouts import SourceRegistry, build_digests, load_layouts, parse_layouts
+from print_jobs import PrintQueue
+from spool import Spool, DEFAULT_SPOOL_PATH
+from feed import FeedReader
+from layout import Layout
+from text_encoding import CodepageEncoder
+from scheduler import CronSchedule, Scheduler
+from metrics import Metrics
+from credentials import BasecampCredentials, TokenFile
+from ticktick_sync import TickTickSync, parse_due
+import threading
+import time
+
+try:
+    from waitress import serve
+except ImportError:
+    serve = None
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
 
 # Step 2: Connect to the ESC/POS printer
-printer_ip = '192.168.2.134'
+printer_ip = os.getenv('PRINTER_IP', '192.168.2.134')
+printer_port = int(os.getenv('PRINTER_PORT', 9100))
+# Optional second printer that takes over while the first one is down
+backup_printer_ip = os.getenv('BACKUP_PRINTER_IP')
+printer_connect_timeout = 10
+
+# Upstream fetches run in parallel, each bounded by its own timeout and all by one shared deadline
+section_timeout = float(os.getenv('DIGEST_SECTION_TIMEOUT', DEFAULT_SECTION_TIMEOUT))
+digest_deadline = float(os.getenv('DIGEST_DEADLINE', DEFAULT_DEADLINE))
+
+# Conditional-GET cache for upstream calls, TTLs are how long a response is used without asking again
+http_cache = HttpCache(os.getenv('HTTP_CACHE_PATH', DEFAULT_CACHE_PATH), max_bytes=int(os.getenv('HTTP_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+rss_ttl = 600
+sunrise_ttl = 24 * 3600
+quote_ttl = 3600
+stock_ttl = 900
+tasks_ttl = 300
+
+# Feeds are read only as far as the entries we print, titles and descriptions come back as plain text
+# The parsed entries are kept in the HTTP cache, so a restart revalidates them instead of downloading again
+feed_reader = FeedReader(timeout=section_timeout, cache=http_cache)
+
+# Text is wrapped and hyphenated here instead of by the printer, 48 columns is font A on 80mm paper
+# Words are hyphenated with the pyphen de_DE dictionary, without pyphen only at hyphens and soft hyphens
+text_layout = Layout(columns={'a': int(os.getenv('PRINTER_COLUMNS', 48))})
+
+# Umlauts and ß are encoded a whole string at a time, switching codepage only when a character needs it
+text_encoder = CodepageEncoder()
+
+# Rendered QR codes, most task URLs are the same from one day to the next
+raster_cache = RasterCache(os.getenv('RASTER_CACHE_DIR', DEFAULT_RASTER_CACHE_DIR))
+
+# Most recently printed digest and its printer, kept compiled for /reprint_news
+last_digest = None
+last_digest_printer = None
+
+# Print jobs are written here before they're sent, so a restart never drops a receipt
+print_spool = Spool(os.getenv('PRINT_SPOOL_PATH', DEFAULT_SPOOL_PATH))
+print_wait_timeout = 60
+http_threads = int(os.getenv('HTTP_THREADS', 8))
+
+# Which digests there are, what's on them and where they print, see digests.yaml.example.
+# Without the file there's one digest, 'news', with the sections below.
+digest_layouts_path = os.getenv('DIGEST_LAYOUTS', 'digests.yaml')
+default_layouts = {
+    'digests': {
+        'news': {
+            'sections': [
+                {'source': 'sun', 'lat': 49.3988, 'lng': 8.6724},
+                {'source': 'quote'},
+                {'source': 'basecamp'},
+                {'source': 'ticktick'},
+                {'source': 'rss', 'url': 'https://www.rnz.de/feed/139-RL_Heidelberg_free.xml', 'count': 3, 'caption': 'Heidelberg News'},
+                {'source': 'rss', 'url': 'https://www.tagesschau.de/inland/index~rss2.xml', 'count': 3, 'caption': 'Tagesschau'},
+            ],
+        },
+    },
+}
+
+# All digests are fetched and rendered ahead of time on this schedule, /print_news sends the latest one
+digest_schedule = os.getenv('DIGEST_SCHEDULE', '*/30 5-22 * * *')
+digest_max_age = float(os.getenv('DIGEST_MAX_AGE', 3600))
+warm_digests = {}
+warm_digest_built = None
+warm_digest_lock = threading.Lock()
+
+# OAuth tokens are re-read only when their file changes, the Basecamp account id is looked up once per token.
+# Tokens are renewed ahead of expiry on this schedule, so a print never waits for launchpad.
+basecamp_tokens = TokenFile('.bc_token')
+ticktick_tokens = TokenFile('.tt_token')
+basecamp_credentials = BasecampCredentials(basecamp_tokens,
+                                           client_id=os.getenv('BASECAMP_CLIENT_ID'),
+                                           client_secret=os.getenv('BASECAMP_CLIENT_SECRET'),
+                                           redirect_uri=os.getenv('BASECAMP_CALLBACK_URL'),
+                                           timeout=section_timeout)
+credentials_schedule = os.getenv('CREDENTIALS_SCHEDULE', '17 * * * *')
+ticktick_expiry_warning = 7 * 24 * 3600
+
+# All TickTick projects are synced in one parallel sweep and kept between prints,
+# afterwards only stale projects are asked again and unchanged ones answer 304
+ticktick_sync = TickTickSync(lambda: ticktick_tokens.access_token, timeout=section_timeout)
+ticktick_due_days = int(os.getenv('TICKTICK_DUE_DAYS', 0))
+
+# Stage timings and per-printer counters, scraped from /metrics
+metrics = Metrics()
+metrics.describe('stage_seconds', 'Time per stage: fetch and render per source, cut, digest, connect and send per printer')
+metrics.describe('jobs_total', 'Finished print jobs per printer and outcome')
+metrics.describe('bytes_total', 'ESC/POS bytes sent per printer')
+metrics.describe('failures_total', 'Failed send attempts per printer')
+metrics.describe('retries_total', 'Send attempts scheduled again per printer')
+metrics.describe('failovers_total', 'Jobs moved to the backup printer')
+metrics.describe('section_failures_total', 'Digest sections dropped per source')
+metrics.describe('errors_total', 'Requests answered with an error per route')
+metrics.describe('queue_depth', 'Print jobs waiting to be sent')
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
-def print_rss_feed(printer, caption = 'Heidelberg News', rss_feed_url='https://www.rnz.de/feed/139-RL_Heidelberg_free.xml', _count = 5):
+def fetch_rss_feed(rss_feed_url='https://www.rnz.de/feed/139-RL_Heidelberg_free.xml', _count = 5):
+    return feed_reader.entries(rss_feed_url, _count, ttl=rss_ttl)
+
+def render_rss_feed(printer, entries, caption = 'Heidelberg News'):
     printer.text(f"{ caption }\n")
     #printer.set(align='left', bold=False, double_height=False)
     printer.set(bold= False,normal_textsize=True)
 
-    feed = feedparser.parse(rss_feed_url)
     # Print each entry from the RSS feed
-    for entry in feed.entries[:_count]:  # Limit to the first 5 headlines
+    for entry in entries:
         # Wrap text for the small paper width
-        #headline = textwrap.fill(entry.title, width=52)
-        #description = textwrap.fill(entry.description, width=52)
-
-        headline = entry.title
-        description = entry.description
+        headline = text_layout.fill(entry['title'])
+        description = text_layout.fill(entry['description'])
 
         # Print the headline and description
         printer.set(bold= True,normal_textsize=True)
@@ -43,30 +160,92 @@ def print_rss_feed(printer, caption = 'Heidelberg News', rss_feed_url='https://w
         printer.text(f"{description}\n")
         printer.text("\n---\n\n")
 
+def print_rss_feed(printer, caption = 'Heidelberg News', rss_feed_url='https://www.rnz.de/feed/139-RL_Heidelberg_free.xml', _count = 5):
+    render_rss_feed(printer, fetch_rss_feed(rss_feed_url, _count), caption = caption)
+
+def send_data(host, data):
+    # the whole compiled receipt goes out in one write
+    with metrics.timer('stage_seconds', stage='connect', printer=host):
+        printer = Network(host, port=printer_port, timeout=printer_connect_timeout)
+        printer.open()
+    try:
+        with metrics.timer('stage_seconds', stage='send', printer=host):
+            printer._raw(data)
+    finally:
+        printer.close()
+
+# All printing goes through one worker thread, request threads only fetch and render.
+# Jobs still in the spool from before a restart are sent again first, failed sends are retried with backoff.
+print_queue = PrintQueue(send_data, spool=print_spool,
+                         backups={printer_ip: backup_printer_ip} if backup_printer_ip else None,
+                         metrics=metrics)
+
+def build_all_digests(refresh=False):
+    # Fetch everything before touching the printer, so the socket isn't held open during upstream calls.
+    # A source used by several digests with the same parameters is fetched once for all of them.
+    # refresh fetches every source again instead of taking what it still has cached
+    return build_digests(list(digest_layouts.values()),
+                         lambda: Receipt(raster_cache=raster_cache, encoder=text_encoder),
+                         deadline=digest_deadline, metrics=metrics, refresh=refresh)
+
+def refresh_digest(refresh=False):
+    global warm_digests, warm_digest_built
+    # Built without the lock, so a print never waits for a refresh's upstream calls
+    started, built = time.monotonic(), datetime.datetime.now()
+    receipts = build_all_digests(refresh)
+    elapsed = time.monotonic() - started
+    with warm_digest_lock:
+        # A slower refresh that started earlier doesn't replace a newer result
+        if warm_digest_built is None or built >= warm_digest_built:
+            warm_digests, warm_digest_built = receipts, built
+    metrics.observe('stage_seconds', elapsed, stage='digest')
+    pprint(f"{len(receipts)} digests pre-rendered in {elapsed:.2f}s ({sum(len(receipt.output) for receipt in receipts.values())} bytes)")
+    return receipts
+
+def current_digest(name=None, force_refresh=False):
+    # The pre-rendered digests are used unless they're from another day or older than digest_max_age
+    name = name or default_digest
+    with warm_digest_lock:
+        receipt, built = warm_digests.get(name), warm_digest_built
+    if force_refresh or receipt is None:
+        return refresh_digest(refresh=force_refresh)[name]
+    now = datetime.datetime.now()
+    if built.date() != now.date() or (now - built).total_seconds() > digest_max_age:
+        return refresh_digest()[name]
+    return receipt
+
 # Step 3: Format and print the news
 @app.route('/print_news')
 def print_news():
-    try:
-        printer= Network(printer_ip)
-        # Print the feed title
-        print_daily_basics(printer= printer)
-
-        print_daily_quote(printer = printer)
+    name = request.args.get('digest') or default_digest
+    if name not in digest_layouts:
+        return jsonify({"status": "error", "message": f"Unknown digest {name}."}), 404
 
-        print_basecamp_tasks(printer= printer)
-
-        #printer.set(align='center', bold=True, double_height=True)
-        print_rss_feed(printer = printer, caption = 'Heidelberg News', rss_feed_url='https://www.rnz.de/feed/139-RL_Heidelberg_free.xml', _count = 3)
-
-        print_rss_feed(printer = printer, caption= 'Tagesschau', rss_feed_url='https://www.tagesschau.de/inland/index~rss2.xml', _count = 3)
+    try:
+        receipt = current_digest(name, force_refresh=request.args.get('refresh', '').lower() in ('1', 'true', 'yes'))
+
+        printer = digest_layouts[name].printer
+        job = print_queue.submit('news', printer, receipt.output, job_id=request.args.get('job_id'))
+        if not job.wait(print_wait_timeout):
+            return jsonify({"status": "queued", "job_id": job.job_id, "status_url": url_for('job_status', job_id=job.job_id)}), 202
+        if job.status != 'done':
+            return jsonify({"status": "error", "message": "Failed to print.", "job_id": job.job_id}), 500
+
+        global last_digest, last_digest_printer
+        last_digest, last_digest_printer = receipt, printer
+        return jsonify({"status": "success", "message": "Printed successfully!", "job_id": job.job_id}), 200
+    except Exception as e:
+        pprint(e)
+        metrics.inc('errors_total', route='print_news')
+        return jsonify({"status": "error", "message": f"Failed to print. ({str(e)})"}), 500
 
-        
+@app.route('/reprint_news')
+def reprint_news():
+    if last_digest is None:
+        return jsonify({"status": "error", "message": "Nothing printed yet."}), 404
 
-        # Step 4: Cut the paper
-        printer.cut()
-        return jsonify({"status": "success", "message": "Printed successfully!"}), 200
-    except Exception as e:
-        return jsonify({"status": "error", "message": "Failed to print."}), 500
+    job = print_queue.submit('reprint', last_digest_printer, last_digest.output, job_id=request.args.get('job_id'))
+    return jsonify({"status": "queued", "job_id": job.job_id, "status_url": url_for('job_status', job_id=job.job_id)}), 202
 
 @app.route('/print_text')
 def print_text():
@@ -81,200 +260,175 @@ def print_text():
         text = None
 
     try:
-        printer = Network(printer_ip)
+        receipt = Receipt(encoder=text_encoder)
 
         if headline:
-            printer.set(double_width=True, double_height=True, align='center',bold=True)
-            printer.text(f"{ headline }\n\n")
-            printer.set(double_width=False, double_height=False, align='center',bold=False, normal_textsize= True)
+            receipt.set(double_width=True, double_height=True, align='center',bold=True)
+            receipt.text(f"{ text_layout.fill(headline, size='2x') }\n\n")
+            receipt.set(double_width=False, double_height=False, align='center',bold=False, normal_textsize= True)
 
         if text:    
-            printer.text(f"{ text }\n\n")
+            receipt.text(f"{ text_layout.fill(text) }\n\n")
 
-        printer.cut()
-        return jsonify({"status": "success", "message": "Printed successfully!"}), 200
+        receipt.cut()
+        # The printer is driven from the queue, the caller gets a job id to poll.
+        # Passing your own job_id makes retries safe, a known id isn't printed again.
+        job = print_queue.submit('text', printer_ip, receipt.output, job_id=request.args.get('job_id'))
+        return jsonify({"status": "queued", "job_id": job.job_id, "status_url": url_for('job_status', job_id=job.job_id)}), 202
     except Exception as e:
+        metrics.inc('errors_total', route='print_text')
         return jsonify({"status": "error", "message": f"Failed to print. ({str(e)})"}), 500
-    
 
-def print_daily_basics(printer):
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = print_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job.as_dict()), 200
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format
+    metrics.set('queue_depth', print_queue.depth())
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
 
+def fetch_daily_basics(lat=49.3988, lng=8.6724):
+    sunset = None
     try:
-        if printer == None:
-            printer = Network(printer_ip)
+        # explicit date instead of 'today', so a cached answer never outlives its day
+        sunset = http_cache.get(f"https://api.sunrise-sunset.org/json?lat={ lat }&lng={ lng }&date={ date.today().isoformat() }&tzid=Europe/Berlin", ttl=sunrise_ttl, timeout=section_timeout).json()
+    except Exception as e:
+        pprint(e)
 
-        today = date.today()
+    return {
+        'today': date.today(),
+        'sunrise': sunset['results']['sunrise'] if sunset else None,
+        'sunset': sunset['results']['sunset'] if sunset else None,
+    }
+
+def render_daily_basics(printer, basics):
+    printer.set(double_width=True, double_height=True, align='center',bold=True)
+    printer.text(f"{ text_layout.fill(basics['today'].strftime('%A %x'), size='2x') }\n\n")
+    printer.set(double_width=False, double_height=False, align='center',bold=False, normal_textsize= True)
 
-        printer.set(double_width=True, double_height=True, align='center',bold=True)
-        printer.text(f"{ today.strftime('%A %x')}\n\n")
-        printer.set(double_width=False, double_height=False, align='center',bold=False, normal_textsize= True)
+    if basics['sunrise']:
+        printer.text(f"{ basics['sunrise'] } - { basics['sunset']}\n")
 
-        sunset = requests.get("https://api.sunrise-sunset.org/json?lat=49.3988&lng=8.6724&date=today&tzid=Europe/Berlin").json()
+    printer.set(double_width=True, double_height=True, align='center')
+    printer.text(f'# { random.randint(1,53) }\n')
+    printer.set(double_width=False, double_height=False, align='center', normal_textsize=True)
 
-        printer.text(f"{ sunset['results']['sunrise'] } - { sunset['results']['sunset']}\n")
+    printer.set(align='left')
+
+def print_daily_basics(printer):
 
-        printer.set(double_width=True, double_height=True, align='center')
-        printer.text(f'# { random.randint(1,53) }\n')
-        printer.set(double_width=False, double_height=False, align='center', normal_textsize=True)
+    try:
+        if printer == None:
+            printer = Network(printer_ip)
 
-        printer.set(align='left')
+        render_daily_basics(printer, fetch_daily_basics())
 
     except Exception as e:
         pprint(e)
 
 def get_basecamp_access_token_accountid():
-
-    access_token = None
-
     try:
-
-        with open('.bc_token','r') as f:
-            access_token = f.read().replace('\n','')
-
-        if not access_token:
-            print('Access token not there.')
-            exit(1)
-
-        # get account id
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'User-Agent': 'ESCPrinter (daniel@dakoller.net)',
-        }
-        r = requests.get('https://launchpad.37signals.com/authorization.json',headers= headers)
-        resp = r.json()
-        pprint(resp)
-        # look for bc3 product
-        account_id = None
-        for item in resp['accounts']:
-            if item['product'] == 'bc3':
-                account_id = item['id']
-
-        return access_token, account_id
+        # cached, launchpad is only asked when the token changed or the account id is unknown
+        return basecamp_credentials.get()
     except Exception as e:
         pprint(e)
         return None,None
 
-def get_ticktick_accesstoken():
-    access_token = None
-
-    with open('.tt_token','r') as f:
-        access_token = f.read().replace('\n','')
-
-    if not access_token:
-        print('Access token not there.')
-        exit(1)
-
-    ## get account id
-    #headers = {
-    #    'Authorization': f'Bearer {access_token}',
-    #}
+def maintain_credentials():
+    basecamp_credentials.maintain()
+
+    # TickTick tokens can't be refreshed, only renewed by logging in again
+    expires_at = ticktick_tokens.read().get('expires_at')
+    if expires_at and expires_at - time.time() < ticktick_expiry_warning:
+        pprint(f"TickTick token expires {datetime.datetime.fromtimestamp(expires_at)}, log in again via /ticktick_callback")
+
+basecamp_client = None
+basecamp_client_key = None
+basecamp_client_lock = threading.Lock()
+
+def get_basecamp_client():
+    # One client per token and account, so its keep-alive connections outlive a single print
+    global basecamp_client, basecamp_client_key
+    access_token, account_id = get_basecamp_access_token_accountid()
+    with basecamp_client_lock:
+        if basecamp_client is None or basecamp_client_key != (access_token, account_id):
+            basecamp_client = BasecampClient(access_token, account_id,
+                                             max_workers=int(os.getenv('BASECAMP_MAX_WORKERS', DEFAULT_MAX_WORKERS)),
+                                             timeout=section_timeout,
+                                             cache=http_cache)
+            basecamp_client_key = (access_token, account_id)
+        return basecamp_client
+
+def fetch_basecamp_tasks():
+    client = get_basecamp_client()
+
+    _tasks = []
+    for task in client.assigned_todos(int(os.getenv('BASECAMP_OWN_ACCOUNT_ID'))):
+        _tasks.append({
+            'project': task['bucket']['name'],
+            'content': task['content'],
+            'due_date': task['due_on'],
+            'status': task['status'],
+            'url': task['app_url'],
+        })
+
+    # Todos arrive in completion order, keep the receipt stable by sorting on due date
+    _tasks.sort(key=lambda task: (task['due_date'] is None, task['due_date'] or '', task['project']))
+    return _tasks
+
+def fetch_ticktick_tasks(due_days=None):
+    until = date.today() + datetime.timedelta(days=ticktick_due_days if due_days is None else due_days)
+
+    _tasks = []
+    for task in ticktick_sync.due_tasks(until):
+        _tasks.append({
+            'project': task['projectName'],
+            'content': task['title'],
+            'due_date': parse_due(task['dueDate']).isoformat(),
+            'status': task.get('status'),
+            'url': ticktick_sync.url(task),
+        })
+
+    # Same order as the Basecamp tasks, overdue first
+    _tasks.sort(key=lambda task: (task['due_date'], task['project']))
+    return _tasks
+
+def render_basecamp_tasks(printer, _tasks, caption = 'Basecamp-Tasks'):
+    if len(_tasks) > 0:
 
-    #r = requests.get('https://ticktick.com/open/v1/project',headers= headers)
-    #resp = r.json()
-
-    #pprint(resp)
+        printer.set(bold= True,normal_textsize=True)
+        printer.text(f"{ caption }:\n")
+        printer.set(bold= False,normal_textsize=True)
+        #printer.text(f"{description}\n")
+        #printer.text("\n---\n\n")
 
-    return access_token
+        for task in _tasks:
+            printer.set(bold= True,normal_textsize=True)
+            printer.text(f"{ text_layout.fill(task['content']) }\n")
+            printer.set(bold= False,normal_textsize=True)
+            printer.text(f"{ text_layout.fill('from ' + task['project']) }\n")
+            printer.set(bold= True,normal_textsize=True)
+            printer.text(f"{task['due_date']}\n")
+            printer.set(bold= False,normal_textsize=True)
+            printer.qr(task['url'],size=5)
+            printer.text("\n---\n\n")
 
 def print_basecamp_tasks(printer):
     try:
-        access_token, account_id = get_basecamp_access_token_accountid()
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'User-Agent': 'ESCPrinter (daniel@dakoller.net)',
-        }
-
         if printer == None:
             printer = Network(printer_ip)
 
-        #pprint(account_id)
-        _tasks = []
-
-        # get projects
-        projects = requests.get(f'https://3.basecampapi.com/{account_id}/projects.json', headers=headers).json()
-
-        for project in projects:
-            #pprint(project)
-            project_id = project['id']
-
-            # get todo set id
-            todoset_id = None
-            for item in project['dock']:
-                if item['name'] == 'todoset':
-                    todoset_id = item['id']
-
-            todolists = requests.get(f'https://3.basecampapi.com/{account_id}/buckets/{project_id}/todosets/{todoset_id}/todolists.json', headers=headers).json()
-            for todolist in todolists:
-                #pprint(todolist)
-                todolist_id = todolist['id']
-
-                # get tasks finally
-                tasks = requests.get(f'https://3.basecampapi.com/{account_id}/buckets/{project_id}/todolists/{todolist_id}/todos.json',headers=headers).json()
-                #pprint(tasks)
-
-                for task in tasks:
-                    if task['assignees'] != []:
-                        for assignee in task['assignees']:
-                            if assignee['id'] == int(os.getenv('BASECAMP_OWN_ACCOUNT_ID')):
-                                _tasks.append({
-                                    'project': task['bucket']['name'],
-                                    'content': task['content'],
-                                    'due_date': task['due_on'],
-                                    'status': task['status'],
-                                    'url': task['app_url'],
-                                })
-        #exit(0)
-        if len(_tasks) > 0:
-
-            printer.set(bold= True,normal_textsize=True)
-            printer.text(f"Basecamp-Tasks:\n")
-            printer.set(bold= False,normal_textsize=True)
-            #printer.text(f"{description}\n")
-            #printer.text("\n---\n\n")
-
-            for task in _tasks:
-                printer.set(bold= True,normal_textsize=True)
-                printer.text(f"{task['content']} ")
-                printer.set(bold= False,normal_textsize=True)
-                printer.text(f"from {task['project']}\n")
-                printer.set(bold= True,normal_textsize=True)
-                printer.text(f"{task['due_date']}\n")
-                printer.set(bold= False,normal_textsize=True)
-                printer.qr(task['url'],size=5)
-                printer.text("\n---\n\n")
+        render_basecamp_tasks(printer, fetch_basecamp_tasks())
 
     except Exception as e:
         print(e)
 
-def get_ticktick_tasks():
-    access_token = get_ticktick_accesstoken()
-
-    try:
-
-        auth_client = OAuth2(client_id=os.getenv("TICKTICK_CLIENT_ID"),
-                        client_secret=os.getenv("TICKTICK_CLIENT_SECRET"),
-                        redirect_uri=os.getenv("TICKTICK_REDIRECT_URI"))
-
-        client = TickTickClient(os.getenv("TICKTICK_USERNAME"), os.getenv("TICKTICK_PASSWORD"), auth_client)
-
-        pprint(client.state['tasks'])
-
-
-    except Exception as e:
-        pprint(e)
-
-
-def get_ticktick_api():
-    access_token = get_ticktick_accesstoken()
-
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-    }
-
-    r = requests.get('https://api.ticktick.com/open/v1/project/inbox122326785/task/66b776cfc1b6d19b4d30a79d/',headers=headers)
-
-    pprint(r.text)
-
 @app.route('/basecamp_callback')
 def basecamp_callback():
     request_data = request.args
@@ -292,8 +446,8 @@ def basecamp_callback():
     r = requests.post('https://launchpad.37signals.com/authorization/token', data=data)
     response = r.json()
     if 'access_token' in response.keys():
-        with open('.bc_token','w') as f:
-            f.write(response['access_token'])
+        # keeps the refresh token and expiry, so the token can be renewed before it runs out
+        basecamp_tokens.write(response)
 
     return jsonify({"status": "success", "message": "Callback received!"}), 200
 
@@ -318,37 +472,101 @@ def ticktick_callback():
     response = r.json()
     pprint(response)
     if 'access_token' in response.keys():
-        with open('.tt_token','w') as f:
-            f.write(response['access_token'])
+        ticktick_tokens.write(response)
 
     return jsonify({"status": "success", "message": "Callback received!"}), 200
 
+def fetch_daily_quote():
+    # 'today' has no date in the URL, so a quote fetched before midnight is never fresh after it
+    now = datetime.datetime.now()
+    since_midnight = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+    return http_cache.get('https://zenquotes.io/api/today', ttl=min(quote_ttl, since_midnight), timeout=section_timeout).json()[0]
+
+def render_daily_quote(printer, r):
+    printer.set(bold= True,double_width=True,align='center')
+    printer.text(f"\n\n{ text_layout.fill(r['q'], size='2w') }\n")
+    printer.set(bold= False,normal_textsize=True, align='center')
+    printer.text(f"\n{ text_layout.fill(r['a']) }\n\n")
+    printer.set(bold= False,normal_textsize=True, align='left')
+    #pprint(r)
+
 def print_daily_quote(printer):
     try:
         if printer == None:
             printer= Network(printer_ip)
 
-        r = requests.get('https://zenquotes.io/api/today').json()[0]
-
-        printer.set(bold= True,double_width=True,align='center')
-        printer.text(f"\n\n{ r['q'] }\n")
-        printer.set(bold= False,normal_textsize=True, align='center')
-        printer.text(f"\n{ r['a'] }\n\n")
-        printer.set(bold= False,normal_textsize=True, align='left')
-        #pprint(r)
+        render_daily_quote(printer, fetch_daily_quote())
 
     except Exception as e:
         pprint(e)
 
+def fetch_stock_quote(symbol='SAP'):
+    if yf is None:
+        raise RuntimeError('yfinance is not installed')
+
+    info = yf.Ticker(symbol).info
+    return {
+        'symbol': symbol,
+        'name': info.get('shortName') or symbol,
+        'price': info.get('currentPrice') or info.get('regularMarketPrice'),
+        'previous_close': info.get('previousClose') or info.get('regularMarketPreviousClose'),
+        'currency': info.get('currency', ''),
+    }
+
+def render_stock_quote(printer, quote):
+    printer.set(bold= True,normal_textsize=True, align='left')
+    printer.text(f"{ text_layout.fill(quote['name']) }\n")
+    printer.set(bold= False,normal_textsize=True)
+
+    change = ''
+    if quote['price'] and quote['previous_close']:
+        change = f" ({ (quote['price'] - quote['previous_close']) / quote['previous_close'] * 100:+.1f}%)"
+    printer.text(f"{ quote['price'] } { quote['currency'] }{ change }\n\n")
+
+# Sources digest layouts can use. Each declares how long its data is reused and how many of its fetches run at once,
+# both can be overridden per source in the layout file.
+# sun and quote aren't kept here: their answer belongs to a day, which the HTTP cache already checks.
+digest_sources = SourceRegistry()
+digest_sources.register('rss', lambda url, count=3: fetch_rss_feed(url, count), render_rss_feed,
+                        ttl=rss_ttl, concurrency=4, timeout=section_timeout,
+                        fetch_params=('url', 'count'), render_params=('caption',))
+digest_sources.register('sun', fetch_daily_basics, render_daily_basics,
+                        concurrency=2, timeout=section_timeout,
+                        fetch_params=('lat', 'lng'))
+digest_sources.register('quote', fetch_daily_quote, render_daily_quote,
+                        concurrency=1, timeout=section_timeout)
+digest_sources.register('basecamp', fetch_basecamp_tasks, render_basecamp_tasks,
+                        ttl=tasks_ttl, concurrency=1, timeout=section_timeout,
+                        render_params=('caption',))
+digest_sources.register('ticktick', fetch_ticktick_tasks, partial(render_basecamp_tasks, caption = 'TickTick-Tasks'),
+                        ttl=tasks_ttl, concurrency=1, timeout=section_timeout,
+                        fetch_params=('due_days',), render_params=('caption',))
+digest_sources.register('stock', fetch_stock_quote, render_stock_quote,
+                        ttl=stock_ttl, concurrency=2, timeout=section_timeout,
+                        fetch_params=('symbol',))
+
+if os.path.exists(digest_layouts_path):
+    digest_layouts = load_layouts(digest_layouts_path, digest_sources, printer_ip)
+else:
+    digest_layouts = parse_layouts(default_layouts, digest_sources, printer_ip)
+default_digest = os.getenv('DEFAULT_DIGEST') or next(iter(digest_layouts))
+
 # Execute the print job
 if __name__ == '__main__':
     #pprint(f"Basecamp oAuth Link:  https://launchpad.37signals.com/authorization/new?type=web_server&client_id={ os.getenv('BASECAMP_CLIENT_ID') }&redirect_uri={ os.getenv( 'BASECAMP_CALLBACK_URL' )}")
     #pprint(f"Ticktick: https://ticktick.com/oauth/authorize?client_id={ os.getenv('TICKTICK_CLIENT_ID')}&scope=tasks:read&redirect_uri={os.getenv('TICKTICK_REDIRECT_URI')}&response_type=code")
-    app.run(debug=False, host='0.0.0.0', port=5000)
+    digest_scheduler = Scheduler(CronSchedule(digest_schedule), refresh_digest, name='digest')
+    credentials_scheduler = Scheduler(CronSchedule(credentials_schedule), maintain_credentials, name='credentials')
+    credentials_scheduler.start(run_now=True)
+    digest_scheduler.start(run_now=True)
+
+    if serve is not None:
+        # waitress serves requests from a thread pool, so a slow digest doesn't block quick calls
+        serve(app, host='0.0.0.0', port=5000, threads=http_threads)
+    else:
+        app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
     #print_news()
     #pprint(print_basecamp_tasks(None))
-    #get_ticktick_tasks()
-    #get_ticktick_api()
     #print_daily_basics(None)
     #print_daily_quote(None)
 
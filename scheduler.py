@@ -0,0 +1,124 @@
+"""Minimal cron-style scheduler for background jobs."""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Set
+
+_LOGGER = logging.getLogger(__name__)
+
+# (low, high) for minute, hour, day of month, month, day of week (0 = Sunday)
+_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+# A year covers every combination a valid expression can describe
+_SEARCH_LIMIT = timedelta(days=366)
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in '{field}'")
+
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+
+        if start < low or end > high or start > end:
+            raise ValueError(f"'{field}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A five-field cron expression: minute, hour, day of month, month, day of week.
+
+    Fields take ``*``, numbers, ranges (``6-22``), lists (``0,30``) and
+    steps (``*/15``). As in cron, when both day fields are restricted a day
+    matches if either of them does. Day of week 7 is not accepted, use 0
+    for Sunday.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got '{expression}'")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELDS)
+        )
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        if self._any_day:
+            return weekday
+        if self._any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first matching minute after ``moment``."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + _SEARCH_LIMIT
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+class Scheduler:
+    """Runs a function on a cron schedule in a daemon thread.
+
+    Runs never overlap: if one takes longer than the gap to the next
+    matching minute, the missed run is skipped rather than queued.
+    """
+
+    def __init__(self, schedule: CronSchedule, job: Callable[[], None], name: str = "scheduler"):
+        self.schedule = schedule
+        self.job = job
+        self.name = name
+        self.next_run: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self, run_now: bool = False) -> None:
+        """Start the thread, optionally running the job once straight away."""
+        self._run_now = run_now
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current run."""
+        self._stop.set()
+
+    def _run(self) -> None:
+        if self._run_now:
+            self._call()
+        while not self._stop.is_set():
+            self.next_run = self.schedule.next_after(datetime.now())
+            delay = (self.next_run - datetime.now()).total_seconds()
+            if self._stop.wait(max(delay, 0)):
+                break
+            self._call()
+
+    def _call(self) -> None:
+        try:
+            self.job()
+        except Exception as e:
+            _LOGGER.error(f"Scheduled job {self.name} failed: {e}")
@@ -0,0 +1,116 @@
+"""Durable SQLite spool for compiled print jobs."""
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_PATH = ".print_spool.sqlite"
+DEFAULT_RETENTION = 24 * 3600
+PURGE_INTERVAL = 3600
+
+PENDING_STATUSES = ("queued", "printing")
+
+
+class Spool:
+    """Append-only record of print jobs that outlives the process.
+
+    Jobs are written before they are sent and marked finished after the
+    printer has taken them, so anything still pending when the process is
+    killed is replayed on the next start: delivery is at least once. Job
+    ids are unique, adding one that is already spooled is a no-op, which
+    lets callers retry a submit safely.
+
+    The database runs in WAL mode with ``synchronous=NORMAL``: a commit is
+    safe from the process dying straight away, and SQLite only fsyncs when
+    it checkpoints the WAL, so writes are batched instead of paying for a
+    sync per job. Pass ``synchronous="FULL"`` to survive power loss too.
+    Finished jobs are deleted after ``retention`` seconds.
+    """
+
+    def __init__(self, path: str = DEFAULT_SPOOL_PATH, synchronous: str = "NORMAL", retention: float = DEFAULT_RETENTION):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " job_id TEXT NOT NULL UNIQUE,"
+            " printer TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " data BLOB NOT NULL,"
+            " status TEXT NOT NULL,"
+            " error TEXT,"
+            " created REAL NOT NULL,"
+            " finished REAL)"
+        )
+        self._db.commit()
+
+    def add(self, job_id: str, printer: str, data: bytes, kind: str = "") -> bool:
+        """Spool a job, return False if a job with this id already exists."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, printer, kind, data, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, printer, kind, data, time.time()),
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def mark(self, job_ids: List[str], status: str, error: Optional[str] = None) -> None:
+        """Record the outcome of one or more jobs in a single commit."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE job_id = ?",
+                [(status, error, now, job_id) for job_id in job_ids],
+            )
+            self._db.commit()
+        if now - self._last_purge > PURGE_INTERVAL:
+            self.purge()
+
+    def reassign(self, job_id: str, printer: str) -> None:
+        """Move a job to another printer, so a replay sends it there too."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET printer = ? WHERE job_id = ?", (printer, job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job without its data."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id, printer, kind, status, error, created, finished FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def pending(self) -> List[Dict]:
+        """Return the jobs that were never confirmed as printed, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM jobs WHERE status IN ({', '.join('?' * len(PENDING_STATUSES))}) ORDER BY seq",
+                PENDING_STATUSES,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention period."""
+        self._last_purge = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                f"DELETE FROM jobs WHERE status NOT IN ({', '.join('?' * len(PENDING_STATUSES))}) AND finished < ?",
+                (*PENDING_STATUSES, self._last_purge - self.retention),
+            )
+            self._db.commit()
+        if cursor.rowcount:
+            _LOGGER.info(f"Purged {cursor.rowcount} finished jobs from the spool")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The run.py helpers are top-level modules, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
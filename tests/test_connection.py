@@ -0,0 +1,71 @@
+"""Tests for the integration's printer connection pool."""
+import importlib.util
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+CONNECTION_PY = os.path.join(
+    os.path.dirname(__file__), os.pardir, "custom_components", "escpos_printer", "connection.py"
+)
+
+
+def _load_connection():
+    # Loaded by path, importing the package would need Home Assistant
+    spec = importlib.util.spec_from_file_location("escpos_printer_connection", CONNECTION_PY)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+connection = _load_connection()
+
+
+@pytest.fixture
+def printer():
+    """A TCP server that accepts connections and reads until they close."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    accepted = []
+
+    def serve():
+        while True:
+            try:
+                client, _ = server.accept()
+            except OSError:
+                return
+            accepted.append(client)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield server.getsockname()
+    server.close()
+    for client in accepted:
+        client.close()
+
+
+def test_idle_connection_closes_while_status_is_polled(printer):
+    host, port = printer
+    pool = connection.ConnectionPool(idle_timeout=0.2)
+    pool.run(host, port, lambda escpos_printer: escpos_printer._raw(b"receipt"))
+    conn = pool._get(host, port)
+    assert conn.is_open
+
+    deadline = time.monotonic() + 2
+    while conn.is_open and time.monotonic() < deadline:
+        # Polls as the coordinator does, on the pooled socket while it is open
+        pool.probe(host, port, lambda sock: sock.fileno())
+        pool.close_idle()
+        time.sleep(0.05)
+
+    assert not conn.is_open
+    pool.close_all()
+
+
+def test_probe_without_pooled_connection_leaves_none_open(printer):
+    host, port = printer
+    pool = connection.ConnectionPool()
+    pool.probe(host, port, lambda sock: sock.fileno())
+    assert not pool._get(host, port).is_open
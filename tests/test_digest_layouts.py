@@ -0,0 +1,36 @@
+"""Tests for digest sources and layouts."""
+from digest_layouts import SourceRegistry, build_digests, parse_layouts
+from receipt import Receipt
+
+
+def counting_registry():
+    calls = []
+
+    def fetch():
+        calls.append(len(calls))
+        return len(calls)
+
+    registry = SourceRegistry()
+    registry.register("count", fetch, lambda printer, data: printer.text(f"fetch {data}\n"), ttl=3600)
+    return registry, calls
+
+
+def test_refresh_fetches_a_cached_source_again():
+    registry, calls = counting_registry()
+    source = registry.get("count")
+
+    assert source.fetch({}) == 1
+    assert source.fetch({}) == 1
+    assert source.fetch({}, refresh=True) == 2
+    # The refreshed result is what later fetches get
+    assert source.fetch({}) == 2
+
+
+def test_build_digests_with_refresh_skips_the_source_cache():
+    registry, calls = counting_registry()
+    layouts = list(parse_layouts({"digests": {"news": {"sections": [{"source": "count"}]}}}, registry, "printer").values())
+
+    build_digests(layouts, Receipt)
+    assert b"fetch 1" in build_digests(layouts, Receipt)["news"].output
+    assert b"fetch 2" in build_digests(layouts, Receipt, refresh=True)["news"].output
+    assert len(calls) == 2
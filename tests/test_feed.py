@@ -0,0 +1,46 @@
+"""Tests for the streaming feed reader."""
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from feed import FeedReader
+
+FEED = b"<rss><channel><item><title>A</title><description>a</description></item></channel></rss>"
+LAST_MODIFIED = "Mon, 12 Aug 2024 06:00:00 GMT"
+
+
+@pytest.fixture
+def feed_url():
+    """A feed validated only by Last-Modified, whose 304 doesn't repeat it."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.headers.get("If-Modified-Since"))
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Content-Length", str(len(FEED)))
+            self.end_headers()
+            self.wfile.write(FEED)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/feed", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_validators_survive_a_bare_304(feed_url):
+    url, requests = feed_url
+    reader = FeedReader()
+    for _ in range(3):
+        assert reader.entries(url, 1) == [{"title": "A", "description": "a"}]
+    assert requests == [None, LAST_MODIFIED, LAST_MODIFIED]
@@ -0,0 +1,33 @@
+"""Tests for receipt text layout and hyphenation."""
+import pytest
+
+from layout import layout_text
+
+WRONG_BREAKS = {"Altstadt": "Alts-", "Ausstellung": "Auss-", "Veranstaltung": "Verans-"}
+
+# Wide enough for each word on a line of its own, narrower lines cut it anywhere
+@pytest.mark.parametrize("language", ["de_DE", None])
+@pytest.mark.parametrize("width", range(13, 25))
+def test_words_are_not_broken_inside_a_syllable(language, width):
+    if language:
+        pytest.importorskip("pyphen")
+    for word, wrong in WRONG_BREAKS.items():
+        lines = layout_text(f"Die {word} am Fluss", width, language=language).split("\n")
+        assert not any(line.endswith(wrong) for line in lines)
+
+
+def test_dictionary_breaks_at_syllables():
+    pytest.importorskip("pyphen")
+    assert layout_text("Die Veranstaltung", 10) == "Die Veran-\nstaltung"
+    assert layout_text("Altstadt", 6) == "Alt-\nstadt"
+
+
+def test_without_dictionary_only_hyphens_break():
+    assert layout_text("Die Ausstellung", 12, language=None) == "Die\nAusstellung"
+    assert layout_text("Basecamp-Tasks heute", 12, language=None) == "Basecamp-\nTasks heute"
+
+
+def test_soft_hyphens_break_and_are_removed():
+    text = "Die Aus\xadstel\xadlung"
+    assert layout_text(text, 12, language=None) == "Die Ausstel-\nlung"
+    assert layout_text(text, 20, language=None) == "Die Ausstellung"
@@ -0,0 +1,36 @@
+"""Tests for the run.py print queue."""
+import threading
+
+from print_jobs import STATUS_DONE, PrintQueue
+
+
+def test_retried_job_prints_before_later_jobs():
+    printed = []
+    failed = []
+
+    def send(printer, data):
+        if not failed:
+            failed.append(data)
+            raise OSError("Connection refused")
+        printed.append(data)
+
+    print_queue = PrintQueue(send, retry_delay=0.05)
+    first = print_queue.submit("text", "printer", b"first")
+    second = print_queue.submit("text", "printer", b"second")
+
+    assert second.wait(5)
+    assert printed == [b"first", b"second"]
+    assert first.status == STATUS_DONE and first.attempts == 2
+
+
+def test_history_keeps_unfinished_jobs():
+    release = threading.Event()
+    print_queue = PrintQueue(lambda printer, data: release.wait(5), history=1)
+    jobs = [print_queue.submit("text", "printer", data) for data in (b"a", b"b", b"c")]
+
+    assert all(print_queue.get(job.job_id) is job for job in jobs)
+    release.set()
+    assert jobs[-1].wait(5)
+    # Once finished, the oldest are forgotten again
+    print_queue.submit("text", "printer", b"d").wait(5)
+    assert print_queue.get(jobs[0].job_id) is None
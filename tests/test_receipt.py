@@ -0,0 +1,40 @@
+"""Tests for the in-memory receipt compiler."""
+from raster_cache import RasterCache
+from receipt import Receipt
+from text_encoding import DEFAULT_CODEPAGES, CodepageEncoder
+
+BOLD_ON = b"\x1bE\x01"
+
+
+def test_size_change_sends_bold_again():
+    receipt = Receipt()
+    receipt.set(bold=True, normal_textsize=True)
+    receipt.text("A")
+    receipt.set(bold=True, double_width=True, double_height=True)
+    receipt.text("B")
+
+    # ESC ! for the new size turns emphasis off, so it has to follow it again
+    before_b = receipt.output.split(b"A", 1)[1]
+    assert before_b.index(BOLD_ON) > before_b.index(b"\x1b!0")
+
+
+def test_unchanged_style_is_not_sent_again():
+    receipt = Receipt()
+    receipt.set(bold=True, normal_textsize=True)
+    receipt.text("A")
+    receipt.set(bold=True, normal_textsize=True)
+    receipt.text("B")
+
+    assert receipt.output.split(b"A", 1)[1] == b"B"
+
+
+def test_text_after_qr_selects_its_codepage_again(tmp_path):
+    encoder = CodepageEncoder(codepages=DEFAULT_CODEPAGES)
+    for raster_cache in (None, RasterCache(str(tmp_path))):
+        receipt = Receipt(raster_cache=raster_cache, encoder=encoder)
+        receipt.text("5 €\n")
+        receipt.qr("https://example.com/todo/1")
+        receipt.text("7 €\n")
+
+        # The QR code leaves the printer in another codepage, the € must switch back
+        assert receipt.output.endswith(b"\x1bt" + bytes([DEFAULT_CODEPAGES["CP858"]]) + "7 €\n".encode("cp858"))
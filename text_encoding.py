@@ -0,0 +1,154 @@
+"""Whole-string Unicode to ESC/POS codepage encoding."""
+import codecs
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from escpos.capabilities import get_profile
+
+_LOGGER = logging.getLogger(__name__)
+
+# Tried in this order; all of them cover German
+PREFERRED_CODEPAGES = ["CP858", "CP850", "CP437", "CP1252", "CP852", "CP866"]
+
+# ESC t numbers of the preferred codepages on Epson-compatible printers
+DEFAULT_CODEPAGES = {"CP437": 0, "CP850": 2, "CP1252": 16, "CP852": 18, "CP866": 17, "CP858": 19}
+
+# Typography that is often missing from DOS codepages
+_TRANSLITERATIONS = {
+    "\u00a0": " ",
+    "\u2010": "-", "\u2011": "-", "–": "-", "—": "-",
+    "‘": "'", "’": "'", "‚": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"',
+    "«": '"', "»": '"', "‹": "'", "›": "'",
+    "•": "*", "…": "...", "€": "EUR",
+}
+
+UNKNOWN = b"?"
+
+
+def _select(number: int) -> bytes:
+    return b"\x1bt" + bytes([number])
+
+
+class Codepage:
+    """One printer codepage with its precomputed reverse table."""
+
+    def __init__(self, name: str, number: int):
+        self.name = name
+        self.number = number
+        self.codec = codecs.lookup(name.lower()).name
+        self.table: Dict[str, int] = {}
+        for byte in range(0x80, 0x100):
+            try:
+                char = bytes([byte]).decode(self.codec)
+            except UnicodeDecodeError:
+                continue
+            self.table.setdefault(char, byte)
+
+
+class CodepageEncoder:
+    """Encodes text for the printer with as few codepage switches as possible.
+
+    A reverse table from Unicode to byte is built once for every codepage
+    the printer profile offers, out of ``PREFERRED_CODEPAGES``. Text that
+    the current codepage covers is encoded in one call to the codec. When
+    a character needs another codepage, the one that covers the longest
+    stretch of the following non-ASCII text is selected with ESC t.
+    Characters no codepage has are transliterated, or sent as ``?``.
+    """
+
+    def __init__(self, profile: Optional[str] = None, codepages: Optional[Dict[str, int]] = None):
+        if codepages is None:
+            codepages = self._profile_codepages(profile)
+        self.codepages: List[Codepage] = []
+        for name in PREFERRED_CODEPAGES:
+            if name in codepages:
+                try:
+                    self.codepages.append(Codepage(name, codepages[name]))
+                except LookupError:
+                    _LOGGER.warning(f"No Python codec for codepage {name}, skipping it")
+        self._by_number = {page.number: page for page in self.codepages}
+
+    @staticmethod
+    def _profile_codepages(profile: Optional[str]) -> Dict[str, int]:
+        available = {name: int(number) for number, name in getattr(get_profile(profile), "codePages", {}).items()}
+        codepages = {name: available[name] for name in PREFERRED_CODEPAGES if name in available}
+        return codepages or DEFAULT_CODEPAGES
+
+    def encode(self, text: str, current: Optional[int] = None) -> Tuple[bytes, Optional[int]]:
+        """Encode ``text`` starting in codepage ``current``.
+
+        Returns the bytes, including any ESC t switches, and the codepage
+        the printer is left in.
+        """
+        if text.isascii():
+            return text.encode("ascii"), current
+
+        page = self._by_number.get(current)
+        if page is not None:
+            try:
+                return text.encode(page.codec), current
+            except UnicodeEncodeError:
+                pass
+
+        # Most text fits one codepage entirely, which needs a single switch
+        for candidate in self.codepages:
+            if candidate is page:
+                continue
+            try:
+                return _select(candidate.number) + text.encode(candidate.codec), candidate.number
+            except UnicodeEncodeError:
+                pass
+
+        out = bytearray()
+        for i, char in enumerate(text):
+            if char < "\x80":
+                out += char.encode("ascii")
+                continue
+            if page is not None and char in page.table:
+                out.append(page.table[char])
+                continue
+
+            candidate = self._best_page(text, i)
+            if candidate is None:
+                out += self._transliterate(char, page)
+                continue
+            page = candidate
+            out += _select(page.number)
+            out.append(page.table[char])
+        return bytes(out), page.number if page is not None else current
+
+    def _best_page(self, text: str, start: int) -> Optional[Codepage]:
+        best, best_run = None, 0
+        for page in self.codepages:
+            if text[start] not in page.table:
+                continue
+            run = 0
+            for char in text[start:]:
+                if char < "\x80":
+                    continue
+                if char not in page.table:
+                    break
+                run += 1
+            if run > best_run:
+                best, best_run = page, run
+        return best
+
+    @staticmethod
+    def _transliterate(char: str, page: Optional[Codepage]) -> bytes:
+        replacement = _TRANSLITERATIONS.get(char)
+        if replacement is None:
+            # Drop accents and other combining marks, e.g. ł stays unknown but ě becomes e
+            replacement = "".join(
+                c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c)
+            )
+        out = bytearray()
+        for c in replacement:
+            if c < "\x80":
+                out += c.encode("ascii")
+            elif page is not None and c in page.table:
+                out.append(page.table[c])
+            else:
+                out += UNKNOWN
+        return bytes(out) or UNKNOWN
@@ -0,0 +1,195 @@
+"""Open tasks from the TickTick open API, kept in sync between prints."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from email.utils import formatdate
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_URL = "https://api.ticktick.com/open/v1"
+APP_URL = "https://ticktick.com/webapp/#p"
+# The inbox isn't listed with the projects. It is asked for by this alias
+# until its data has told us its real id, inbox followed by digits
+INBOX = "inbox"
+DUE_FORMATS = ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z")
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 10
+DEFAULT_TTL = 300
+DEFAULT_PROJECTS_TTL = 3600
+
+STATUS_COMPLETED = 2
+
+
+def parse_due(value: Optional[str]) -> Optional[date]:
+    """Return the local due date of a TickTick timestamp like 2024-08-12T22:00:00.000+0000."""
+    if not value:
+        return None
+    for due_format in DUE_FORMATS:
+        try:
+            return datetime.strptime(value, due_format).astimezone().date()
+        except ValueError:
+            pass
+    _LOGGER.warning(f"Could not parse TickTick due date {value}")
+    return None
+
+
+class _Project:
+    """What is known about one project: its tasks and when they were fetched."""
+
+    def __init__(self, project: Dict):
+        self.project = project
+        self.tasks: List[Dict] = []
+        self.etag: Optional[str] = None
+        self.synced_at = 0.0
+
+
+class TickTickSync:
+    """The open tasks of every TickTick project, fetched in one parallel sweep.
+
+    A sync lists the projects and fetches the data of each, inbox
+    included, over at most ``max_workers`` keep-alive connections. The
+    result stays in memory: within ``ttl`` seconds ``tasks`` answers
+    without touching the network. After that only projects whose data is
+    older than ``ttl`` are asked again, with the time of their last fetch
+    as ``If-Modified-Since`` and their ETag, and an unchanged project keeps
+    its tasks as they are. The project list itself is refreshed every
+    ``projects_ttl`` seconds. Everything is thrown away when the token
+    changes.
+    """
+
+    def __init__(
+        self,
+        token: Callable[[], Optional[str]],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        ttl: float = DEFAULT_TTL,
+        projects_ttl: float = DEFAULT_PROJECTS_TTL,
+    ):
+        self.token = token
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ttl = ttl
+        self.projects_ttl = projects_ttl
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        self._projects: Dict[str, _Project] = {}
+        self._projects_synced = 0.0
+        self._token: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def tasks(self) -> List[Dict]:
+        """Return the open tasks of all projects, syncing what is stale."""
+        self.sync()
+        return [task for project in self._projects.values() for task in project.tasks]
+
+    def due_tasks(self, until: Optional[date] = None) -> List[Dict]:
+        """Return open tasks due on or before ``until``, today by default."""
+        until = until or date.today()
+        due = []
+        for task in self.tasks():
+            due_date = parse_due(task.get("dueDate"))
+            if due_date is not None and due_date <= until and task.get("status") != STATUS_COMPLETED:
+                due.append(task)
+        return due
+
+    def sync(self) -> None:
+        """Bring stale projects up to date."""
+        token = self.token()
+        if not token:
+            _LOGGER.error("No TickTick access token")
+            return
+
+        with self._lock:
+            if token != self._token:
+                self._projects.clear()
+                self._projects_synced = 0.0
+                self._token = token
+                self.session.headers["Authorization"] = f"Bearer {token}"
+
+            now = time.time()
+            if now - self._projects_synced > self.projects_ttl:
+                try:
+                    self._sync_projects()
+                except requests.RequestException as e:
+                    if not self._projects:
+                        raise
+                    _LOGGER.warning(f"Could not list TickTick projects, using the known ones: {e}")
+
+            stale = [project for project in self._projects.values() if now - project.synced_at > self.ttl]
+            if not stale:
+                return
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ticktick") as executor:
+                changed = sum(executor.map(self._sync_project, stale))
+            _LOGGER.info(
+                f"Synced {len(stale)} TickTick projects in {time.monotonic() - started:.2f}s, {changed} changed"
+            )
+
+    def _sync_projects(self) -> None:
+        response = self.session.get(f"{BASE_URL}/project", timeout=self.timeout)
+        response.raise_for_status()
+
+        inbox = self._projects.get(INBOX)
+        listed = {INBOX: inbox.project if inbox else {"id": INBOX, "name": "Inbox"}}
+        for project in response.json():
+            if not project.get("closed"):
+                listed[project["id"]] = project
+
+        # Keep what is known about projects that are still there
+        self._projects = {
+            project_id: self._projects.get(project_id) or _Project(project) for project_id, project in listed.items()
+        }
+        for project_id, project in listed.items():
+            self._projects[project_id].project = project
+        self._projects_synced = time.time()
+
+    def _sync_project(self, project: _Project) -> bool:
+        """Fetch one project's tasks, return whether they changed."""
+        headers = {}
+        if project.synced_at:
+            headers["If-Modified-Since"] = formatdate(project.synced_at, usegmt=True)
+        if project.etag:
+            headers["If-None-Match"] = project.etag
+
+        fetched_at = time.time()
+        try:
+            response = self.session.get(
+                f"{BASE_URL}/project/{project.project['id']}/data", headers=headers, timeout=self.timeout
+            )
+            if response.status_code == 304:
+                project.synced_at = fetched_at
+                return False
+            response.raise_for_status()
+        except requests.RequestException as e:
+            # Keep the last known tasks, the project is asked again next time
+            _LOGGER.warning(f"Could not sync TickTick project {project.project.get('name')}: {e}")
+            return False
+
+        data = response.json()
+        tasks = data.get("tasks") or []
+        # Use the id the API answers with, for the inbox it is not the alias we asked for
+        project_id = (data.get("project") or {}).get("id") or next(
+            (task["projectId"] for task in tasks if task.get("projectId")), None
+        )
+        if project_id and project_id != project.project["id"]:
+            project.project = dict(project.project, id=project_id)
+        for task in tasks:
+            task["projectName"] = project.project.get("name")
+            task.setdefault("projectId", project.project["id"])
+        project.tasks = tasks
+        project.etag = response.headers.get("ETag")
+        project.synced_at = fetched_at
+        return True
+
+    @staticmethod
+    def url(task: Dict) -> str:
+        """Return the web app link of a task."""
+        return f"{APP_URL}/{task['projectId']}/tasks/{task['id']}"